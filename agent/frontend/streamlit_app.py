@@ -3,11 +3,38 @@
 import os
 import uuid
 
+import orjson
 import requests
 import streamlit as st
 
 AGENT_API_URL = os.environ.get("AGENT_API_URL", "http://localhost:8400")
 
+
+@st.cache_resource
+def http() -> requests.Session:
+    """Return a process-wide session so keep-alive sockets survive reruns."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def stream_tokens(resp: requests.Response, tools_used: list[str]):
+    """Yield reply text from a ``/chat/stream`` response.
+
+    Tool events are collected into *tools_used* as they arrive.
+    """
+    for line in resp.iter_lines():
+        if not line:
+            continue
+        event = orjson.loads(line)
+        if event["type"] == "token":
+            yield event["content"]
+        elif event["type"] == "tool":
+            tools_used.append(event["name"])
+
+
 # ── Page config ──────────────────────────────────────────────────────────────
 
 st.set_page_config(
@@ -57,34 +84,39 @@ if prompt := st.chat_input("Ask the healthcare agent…"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Get agent response via FastAPI backend
+    # Stream the agent response from the FastAPI backend
     with st.chat_message("assistant"):
-        with st.spinner("Thinking…"):
-            try:
-                resp = requests.post(
-                    f"{AGENT_API_URL}/chat",
-                    json={
+        tools_used: list[str] = []
+        try:
+            with st.spinner("Thinking…"):
+                resp = http().post(
+                    f"{AGENT_API_URL}/chat/stream",
+                    data=orjson.dumps({
                         "message": prompt,
                         "thread_id": st.session_state.thread_id,
-                    },
+                    }),
+                    headers={"Content-Type": "application/json"},
+                    stream=True,
                     timeout=120,
                 )
+            # Closing the response returns its socket to the session's pool,
+            # even if the status check fails or the stream breaks off.
+            with resp:
                 resp.raise_for_status()
-                data = resp.json()
-                response = data["response"]
-                tools_used = data.get("tools_used", [])
-                st.session_state.thread_id = data["thread_id"]
-            except requests.ConnectionError:
-                response = (
-                    "**Agent service unavailable.** "
-                    "Make sure the FastAPI backend is running at "
-                    f"`{AGENT_API_URL}`."
+                st.session_state.thread_id = resp.headers.get(
+                    "X-Thread-Id", st.session_state.thread_id
                 )
-                tools_used = []
-            except requests.RequestException as exc:
-                response = f"**Error communicating with agent service:** {exc}"
-                tools_used = []
-        st.markdown(response)
+                response = st.write_stream(stream_tokens(resp, tools_used))
+        except requests.ConnectionError:
+            response = (
+                "**Agent service unavailable.** "
+                "Make sure the FastAPI backend is running at "
+                f"`{AGENT_API_URL}`."
+            )
+            st.markdown(response)
+        except requests.RequestException as exc:
+            response = f"**Error communicating with agent service:** {exc}"
+            st.markdown(response)
         if tools_used:
             with st.expander("🔧 Tools called"):
                 for tool in tools_used:
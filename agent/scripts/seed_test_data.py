@@ -7,15 +7,16 @@ Run from the agent/ directory:
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import sys
 from pathlib import Path
 
+import orjson
+
 # Ensure the agent package is importable when running as a script.
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from src.auth.oauth2 import OpenEMRAuth
+from src.auth.oauth2 import OpenEMRAuth, close_http_clients
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -47,7 +48,8 @@ async def create_patient(client, patient: dict) -> dict:
     """POST a new patient and return the response JSON."""
     resp = await client.post(f"{API_PREFIX}/patient", json=patient)
     if resp.status_code == 201:
-        data = resp.json().get("data", resp.json())
+        body = orjson.loads(resp.content)
+        data = body.get("data", body)
         logger.info(
             "Created patient %s %s  (pid=%s, uuid=%s)",
             patient["fname"],
@@ -75,7 +77,7 @@ async def add_allergy(client, patient_uuid: str, allergy: dict) -> dict:
     )
     # OpenEMR returns 200 (not 201) for allergy creation.
     if resp.status_code in (200, 201):
-        body = resp.json()
+        body = orjson.loads(resp.content)
         data = body.get("data", body)
         if body.get("validationErrors") or body.get("internalErrors"):
             logger.error(
@@ -103,35 +105,42 @@ async def add_allergy(client, patient_uuid: str, allergy: dict) -> dict:
 # ── Main ──────────────────────────────────────────────────────────────────────
 
 async def main() -> None:
-    auth = OpenEMRAuth()
-
     created: dict[tuple[str, str], dict] = {}
 
-    async with auth.get_client() as client:
-        # 1. Create patients
-        print("\n=== Creating test patients ===\n")
-        for patient in PATIENTS:
-            key = (patient["fname"], patient["lname"])
-            result = await create_patient(client, patient)
-            if result:
-                created[key] = result
-
-        # 2. Add allergies via the standard REST allergy endpoint
-        print("\n=== Adding allergies ===\n")
-        for (fname, lname), allergy_list in ALLERGIES.items():
-            patient_data = created.get((fname, lname))
-            if not patient_data:
-                logger.warning("Skipping allergies for %s %s — patient not created", fname, lname)
-                continue
-
-            puuid = patient_data.get("uuid")
-            if not puuid:
-                logger.warning("No UUID for %s %s — skipping allergies", fname, lname)
-                continue
-
-            logger.info("Adding allergies for %s %s (uuid=%s):", fname, lname, puuid)
-            for allergy in allergy_list:
-                await add_allergy(client, puuid, allergy)
+    client = OpenEMRAuth.instance().client
+
+    # 1. Create patients one at a time.  OpenEMR picks each new pid with an
+    #    unlocked SELECT MAX(pid)+1, so concurrent creates can collide on the
+    #    unique pid and one of them fails.
+    print("\n=== Creating test patients ===\n")
+    for patient in PATIENTS:
+        result = await create_patient(client, patient)
+        if result:
+            created[(patient["fname"], patient["lname"])] = result
+
+    # 2. Add allergies via the standard REST allergy endpoint (these go to an
+    #    auto-increment table, so they can safely run together)
+    print("\n=== Adding allergies ===\n")
+    jobs: list[tuple[str, dict]] = []
+    for (fname, lname), allergy_list in ALLERGIES.items():
+        patient_data = created.get((fname, lname))
+        if not patient_data:
+            logger.warning("Skipping allergies for %s %s — patient not created", fname, lname)
+            continue
+
+        puuid = patient_data.get("uuid")
+        if not puuid:
+            logger.warning("No UUID for %s %s — skipping allergies", fname, lname)
+            continue
+
+        logger.info("Adding allergies for %s %s (uuid=%s):", fname, lname, puuid)
+        jobs.extend((puuid, allergy) for allergy in allergy_list)
+
+    await asyncio.gather(
+        *(add_allergy(client, puuid, allergy) for puuid, allergy in jobs)
+    )
+
+    await close_http_clients()
 
     # 3. Summary
     print("\n=== Summary ===\n")
@@ -14,14 +14,14 @@ import sys
 
 # Ensure config loads .env before anything else
 import src.config as cfg  # noqa: F401
-from src.auth.oauth2 import OpenEMRAuth
+from src.auth.oauth2 import OpenEMRAuth, close_http_clients, close_mysql_pool
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s  %(name)s  %(message)s")
 logger = logging.getLogger(__name__)
 
 
 async def main() -> None:
-    auth = OpenEMRAuth()
+    auth = OpenEMRAuth.instance()
 
     # Step 1 — Register a client if credentials are missing
     if not auth.client_id or not auth.client_secret:
@@ -32,23 +32,24 @@ async def main() -> None:
         print(f"OPENEMR_CLIENT_SECRET={client_secret}")
         print("====================================\n")
 
-        # Enable the client in the Docker database (required before token request)
-        logger.info("Enabling the client in Docker …")
-        OpenEMRAuth.enable_client_via_docker(client_id)
+        # Enable the client in the dev database (required before token request)
+        logger.info("Enabling the client in MySQL …")
+        await auth.enable_client_via_mysql(client_id)
+        await close_mysql_pool()
 
     # Step 2 — Obtain an access token (password grant)
     token = await auth.ensure_token()
     logger.info("Access token acquired (first 12 chars): %s…", token[:12])
 
     # Step 3 — Make an authenticated API request
-    async with auth.get_client() as client:
-        resp = await client.get("/apis/default/api/patient")
-        resp.raise_for_status()
-        data = resp.json()
-        print("\n=== GET /apis/default/api/patient ===")
-        print(json.dumps(data, indent=2)[:2000])
-        print("=====================================\n")
-
+    resp = await auth.client.get("/apis/default/api/patient")
+    resp.raise_for_status()
+    data = resp.json()
+    print("\n=== GET /apis/default/api/patient ===")
+    print(json.dumps(data, indent=2)[:2000])
+    print("=====================================\n")
+
+    await close_http_clients()
     logger.info("Auth flow completed successfully.")
 
 
@@ -11,32 +11,41 @@ dangerous or out-of-scope requests before the LLM is ever invoked.
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
 import sys
 import uuid
+from collections.abc import AsyncIterator
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal
 
-from dotenv import load_dotenv
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
 from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import AIMessage
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, MessagesState, StateGraph
-from langgraph.prebuilt import create_react_agent
 
 # Ensure the agent package is importable when running as a script.
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
+from src.config import settings
 from src.tools import allergy_check, drug_interaction_check, patient_lookup
 from src.verification.scope_guard import (
     CLINICAL_DISCLAIMER,
     CLINICAL_SUPPORT,
-    apply_scope_guard,
     classify_input,
 )
 
-load_dotenv(Path(__file__).resolve().parent.parent.parent / ".env")
-
 logger = logging.getLogger(__name__)
 
 # ── System prompt ────────────────────────────────────────────────────────────
@@ -75,21 +84,106 @@ Always cite which tool provided each piece of information.\
 
 _TOOLS = [patient_lookup, allergy_check, drug_interaction_check]
 
-_llm = ChatAnthropic(
-    model="claude-sonnet-4-20250514",
-    max_tokens=1024,
+# ``name`` of the standalone disclaimer message appended by the outer graph.
+_DISCLAIMER_NAME = "disclaimer"
+
+# Anthropic caches the request prefix up to the last ``cache_control``
+# breakpoint.  Tool schemas precede the system prompt in that prefix, so a
+# single breakpoint here lets every turn reuse the prefill for both.
+_SYSTEM_MESSAGE = SystemMessage(
+    content=[
+        {
+            "type": "text",
+            "text": SYSTEM_PROMPT,
+            "cache_control": {"type": "ephemeral"},
+        },
+    ],
 )
 
-_react_agent = create_react_agent(
-    _llm,
-    _TOOLS,
-    prompt=SYSTEM_PROMPT,
-)
+
+# Upper bound on conversation history sent to the model per call.  The
+# checkpointer keeps the full thread; only the model input is trimmed, so
+# prefill cost stays flat as a conversation grows.
+_MAX_HISTORY_TOKENS = 4000
+
+
+def _latest_human_index(messages: list[AnyMessage]) -> int | None:
+    """Return the index of the last human message, scanning from the end."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return None
+
+
+def _trim_history(messages: list[AnyMessage]) -> list[AnyMessage]:
+    """Keep the most recent turns of *messages* within the token budget.
+
+    Trimming starts on a human message so a tool result is never separated
+    from the tool call that produced it.  If the current turn alone exceeds
+    the budget it is sent whole rather than dropped.  Disclaimer messages
+    are boilerplate for the user, not the model, so they are left out.
+    """
+    messages = [m for m in messages if m.name != _DISCLAIMER_NAME]
+    trimmed = trim_messages(
+        messages,
+        max_tokens=_MAX_HISTORY_TOKENS,
+        strategy="last",
+        token_counter=count_tokens_approximately,
+        start_on="human",
+        end_on=("human", "tool"),
+    )
+    if not trimmed:
+        start = _latest_human_index(messages)
+        trimmed = messages[start:] if start is not None else messages
+    return trimmed
+
+
+class _TrimHistoryMiddleware(AgentMiddleware):
+    """Send the model a trimmed view of the thread on every call."""
+
+    def wrap_model_call(self, request, handler):
+        return handler(request.override(messages=_trim_history(request.messages)))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(
+            request.override(messages=_trim_history(request.messages))
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_react_agent():
+    """Build the LLM client and inner ReAct agent once per process."""
+    # Loads ``.env`` (if not already loaded) so ChatAnthropic finds
+    # ANTHROPIC_API_KEY in the environment.
+    settings()
+    llm = ChatAnthropic(
+        model="claude-sonnet-4-20250514",
+        max_tokens=1024,
+        # Bound a stuck upstream so a turn can't hang the caller forever.
+        timeout=60.0,
+        max_retries=2,
+    )
+    return create_agent(
+        llm,
+        _TOOLS,
+        system_prompt=_SYSTEM_MESSAGE,
+        middleware=[_TrimHistoryMiddleware()],
+    )
 
 # ── Outer graph with scope guard ────────────────────────────────────────────
 
 
-def _scope_guard_node(state: MessagesState) -> MessagesState:
+class AgentState(MessagesState):
+    """Outer graph state: the message list plus this turn's scope category.
+
+    The scope guard records the category it computed so later nodes can
+    read it instead of classifying the same text again.
+    """
+
+    scope_category: str
+
+
+def _scope_guard_node(state: AgentState) -> AgentState:
     """Classify the latest user message and block if necessary.
 
     If blocked, an AIMessage with the block reason is appended to the
@@ -104,17 +198,20 @@ def _scope_guard_node(state: MessagesState) -> MessagesState:
         else str(user_message)
     )
 
-    is_allowed, block_message = apply_scope_guard(user_text)
+    category, block_message = classify_input(user_text)
 
-    if not is_allowed:
+    if block_message is not None:
         logger.info("Scope guard BLOCKED: %s", block_message)
-        return {"messages": [AIMessage(content=block_message)]}
+        return {
+            "messages": [AIMessage(content=block_message)],
+            "scope_category": category,
+        }
 
     # Allowed — return empty update so messages pass through unchanged.
-    return {"messages": []}
+    return {"messages": [], "scope_category": category}
 
 
-def _route_after_guard(state: MessagesState) -> Literal["agent", "__end__"]:
+def _route_after_guard(state: AgentState) -> Literal["agent", "__end__"]:
     """Route to the agent or straight to END based on scope guard result."""
     last = state["messages"][-1]
     # If the scope guard appended an AIMessage, we're blocked.
@@ -123,43 +220,42 @@ def _route_after_guard(state: MessagesState) -> Literal["agent", "__end__"]:
     return "agent"
 
 
-def _append_disclaimer(state: MessagesState) -> MessagesState:
-    """Append clinical disclaimer to CLINICAL_SUPPORT responses."""
-    user_messages = [
-        m for m in state["messages"]
-        if hasattr(m, "type") and m.type == "human"
-    ]
-    if not user_messages:
-        return {"messages": []}
+def _append_disclaimer(state: AgentState) -> AgentState:
+    """Append clinical disclaimer to CLINICAL_SUPPORT responses.
 
-    latest_user_text = user_messages[-1].content
-    category, _ = classify_input(latest_user_text)
-
-    if category == CLINICAL_SUPPORT:
-        last_ai = state["messages"][-1]
-        if isinstance(last_ai, AIMessage):
+    The disclaimer is added as its own short message (named
+    ``_DISCLAIMER_NAME``) rather than a copy of the reply with the suffix,
+    so the checkpoint doesn't store every clinical reply twice.
+    """
+    if state.get("scope_category") == CLINICAL_SUPPORT:
+        if isinstance(state["messages"][-1], AIMessage):
             return {
                 "messages": [
-                    AIMessage(content=last_ai.content + CLINICAL_DISCLAIMER)
+                    AIMessage(content=CLINICAL_DISCLAIMER, name=_DISCLAIMER_NAME)
                 ],
             }
 
     return {"messages": []}
 
 
-# Build the outer graph.
-_builder = StateGraph(MessagesState)
-_builder.add_node("scope_guard", _scope_guard_node)
-_builder.add_node("agent", _react_agent)
-_builder.add_node("disclaimer", _append_disclaimer)
+@functools.lru_cache(maxsize=1)
+def get_graph():
+    """Compile the outer graph on first use and reuse it thereafter.
+
+    Construction is deferred so importing this module stays cheap; the
+    cached graph also owns the process-wide ``MemorySaver`` checkpointer.
+    """
+    builder = StateGraph(AgentState)
+    builder.add_node("scope_guard", _scope_guard_node)
+    builder.add_node("agent", _get_react_agent())
+    builder.add_node("disclaimer", _append_disclaimer)
 
-_builder.add_edge(START, "scope_guard")
-_builder.add_conditional_edges("scope_guard", _route_after_guard)
-_builder.add_edge("agent", "disclaimer")
-_builder.add_edge("disclaimer", END)
+    builder.add_edge(START, "scope_guard")
+    builder.add_conditional_edges("scope_guard", _route_after_guard)
+    builder.add_edge("agent", "disclaimer")
+    builder.add_edge("disclaimer", END)
 
-_checkpointer = MemorySaver()
-graph = _builder.compile(checkpointer=_checkpointer)
+    return builder.compile(checkpointer=MemorySaver())
 
 
 # ── Public helper ────────────────────────────────────────────────────────────
@@ -182,20 +278,20 @@ async def run_agent(
     if thread_id is None:
         thread_id = uuid.uuid4().hex
 
+    graph = get_graph()
     config = {"configurable": {"thread_id": thread_id}}
 
-    # Count messages *before* this turn so we can isolate new ones.
-    snapshot_before = await graph.aget_state(config)
-    prev_count = len(snapshot_before.values.get("messages", []))
-
     result = await graph.ainvoke(
         {"messages": [("user", user_input)]},
         config=config,
     )
 
-    # Extract tool names from messages added during this turn.
+    # Extract tool names from messages added during this turn.  The turn
+    # starts at the latest human message (the input just sent), so a short
+    # scan from the end isolates it without snapshotting state beforehand.
     all_messages = result["messages"]
-    new_messages = all_messages[prev_count:]
+    turn_start = _latest_human_index(all_messages)
+    new_messages = all_messages[turn_start + 1:] if turn_start is not None else []
     tools_used: list[str] = []
     for msg in new_messages:
         if hasattr(msg, "tool_calls") and msg.tool_calls:
@@ -204,9 +300,81 @@ async def run_agent(
                 if name and name not in tools_used:
                     tools_used.append(name)
 
-    # The last message in the list is the assistant's final reply.
+    # The last message in the list is the assistant's final reply, possibly
+    # followed by the separate disclaimer message.
     ai_message = all_messages[-1]
-    return {"response": ai_message.content, "tools_used": tools_used}
+    response = ai_message.content
+    if ai_message.name == _DISCLAIMER_NAME:
+        response = _text_of(all_messages[-2].content) + ai_message.content
+    return {"response": response, "tools_used": tools_used}
+
+
+def _text_of(content: Any) -> str:
+    """Return the plain text of a message or chunk content payload.
+
+    Anthropic chunks carry either a string or a list of content blocks; only
+    ``text`` blocks are user-visible (``tool_use`` blocks are skipped).
+    """
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "")
+        for block in content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+
+async def run_agent_stream(
+    user_input: str, thread_id: str | None = None
+) -> AsyncIterator[dict[str, str]]:
+    """Send a message to the agent and stream the reply as it is generated.
+
+    Args:
+        user_input: The user's natural-language message.
+        thread_id:  Conversation thread identifier, as for :func:`run_agent`.
+
+    Yields:
+        ``{"type": "token", "content": str}`` for each piece of reply text,
+        and ``{"type": "tool", "name": str}`` the first time a tool is
+        called during this turn.
+    """
+    if thread_id is None:
+        thread_id = uuid.uuid4().hex
+
+    config = {"configurable": {"thread_id": thread_id}}
+    tools_seen: set[str] = set()
+    last_message_id: str | None = None
+
+    # ``subgraphs=True`` is required to receive token chunks from the inner
+    # ReAct agent; without it the agent node only reports whole messages.
+    async for _namespace, (msg, metadata) in get_graph().astream(
+        {"messages": [("user", user_input)]},
+        config=config,
+        stream_mode="messages",
+        subgraphs=True,
+    ):
+        if isinstance(msg, ToolMessage):
+            if msg.name and msg.name not in tools_seen:
+                tools_seen.add(msg.name)
+                yield {"type": "tool", "name": msg.name}
+            continue
+
+        if isinstance(msg, AIMessageChunk):
+            text = _text_of(msg.content)
+            if not text:
+                continue
+            # Separate the text of successive LLM calls (e.g. a preamble
+            # before a tool call and the final answer after it).
+            if last_message_id is not None and msg.id != last_message_id:
+                text = "\n\n" + text
+            last_message_id = msg.id
+            yield {"type": "token", "content": text}
+            continue
+
+        # Whole messages written by the outer graph's own nodes: a scope
+        # guard block message or the clinical disclaimer.
+        if metadata.get("langgraph_node") in ("scope_guard", "disclaimer"):
+            yield {"type": "token", "content": _text_of(msg.content)}
 
 
 # ── Standalone test ──────────────────────────────────────────────────────────
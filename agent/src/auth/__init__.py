@@ -1,5 +1,5 @@
 """OAuth2 authentication for OpenEMR API access."""
 
-from src.auth.oauth2 import OpenEMRAuth
+from src.auth.oauth2 import OpenEMRAuth, close_http_clients
 
-__all__ = ["OpenEMRAuth"]
+__all__ = ["OpenEMRAuth", "close_http_clients"]
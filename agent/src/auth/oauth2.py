@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
 import time
+import warnings
+from typing import Any
 
 import httpx
 
@@ -21,21 +25,93 @@ logger = logging.getLogger(__name__)
 _REGISTRATION_PATH = "/oauth2/default/registration"
 _TOKEN_PATH = "/oauth2/default/token"
 
+# Tool calls in one agent turn often hit OpenEMR back to back; HTTP/2 lets
+# them multiplex over one TLS session instead of opening a socket each.
+# The shared client serves every concurrent chat, so the connection cap is
+# sized for bursts rather than a single turn.
+_API_LIMITS = httpx.Limits(
+    max_keepalive_connections=20,
+    max_connections=100,
+    keepalive_expiry=60,
+)
+_API_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Registration and token requests share one pooled client so a refresh
+# reuses an open connection instead of paying a fresh TCP+TLS handshake.
+_token_http_client: httpx.AsyncClient | None = None
+
+
+def _get_token_client() -> httpx.AsyncClient:
+    """Return the shared client for OAuth2 endpoints, creating it lazily."""
+    global _token_http_client
+    if _token_http_client is None or _token_http_client.is_closed:
+        _token_http_client = httpx.AsyncClient(
+            verify=False,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=httpx.Timeout(10.0),
+        )
+    return _token_http_client
+
+
+# Local-development MySQL (see docker/development-easy), used only to enable
+# freshly registered API clients.  aiomysql is an optional dev dependency.
+_mysql_pool = None
+
+
+async def _get_mysql_pool(
+    host: str = "127.0.0.1",
+    port: int = 8320,
+    user: str = "root",
+    password: str = "root",
+    db: str = "openemr",
+):
+    """Return the shared aiomysql pool for the dev database, creating it lazily."""
+    global _mysql_pool
+    if _mysql_pool is None:
+        import aiomysql
+
+        _mysql_pool = await aiomysql.create_pool(
+            host=host, port=port, user=user, password=password, db=db,
+            maxsize=5, autocommit=False,
+        )
+    return _mysql_pool
+
+
+async def close_mysql_pool() -> None:
+    """Close the dev MySQL pool, if one was opened."""
+    global _mysql_pool
+    if _mysql_pool is not None:
+        _mysql_pool.close()
+        await _mysql_pool.wait_closed()
+        _mysql_pool = None
+
+
+async def close_http_clients() -> None:
+    """Close the shared HTTP clients.  Call once on application shutdown."""
+    global _token_http_client
+    if _token_http_client is not None:
+        await _token_http_client.aclose()
+        _token_http_client = None
+    if OpenEMRAuth._instance is not None:
+        await OpenEMRAuth._instance.aclose()
+
 
 class OpenEMRAuth:
     """Handles OAuth2 registration, token acquisition, and refresh for OpenEMR.
 
     After registering a client you must **enable** it before requesting tokens.
     Enable via the OpenEMR admin UI (Administration > System > API Clients) or
-    by calling :pymethod:`enable_client_via_docker`.
+    by calling :pymethod:`enable_client_via_mysql`.
 
     Usage::
 
-        auth = OpenEMRAuth()
-        async with auth.get_client() as client:
-            resp = await client.get("/apis/default/api/patient")
+        client = OpenEMRAuth.instance().client
+        resp = await client.get("/apis/default/api/patient")
     """
 
+    _instance: OpenEMRAuth | None = None
+
     def __init__(
         self,
         base_url: str = OPENEMR_BASE_URL,
@@ -54,7 +130,27 @@ class OpenEMRAuth:
 
         self._access_token: str | None = None
         self._refresh_token: str | None = None
+        # Tokens are "stale" a minute before expiry: still served, but a
+        # background refresh is started so no request waits on the token
+        # endpoint.  Only past ``_expires_at`` do callers block.
+        self._stale_at: float = 0.0
         self._expires_at: float = 0.0
+        self._refresh_task: asyncio.Task | None = None
+        # Serialises token acquisition so concurrent tool calls that all
+        # find the token stale share a single round trip to OpenEMR.
+        self._token_lock = asyncio.Lock()
+        self._client: httpx.AsyncClient | None = None
+
+    @classmethod
+    def instance(cls) -> OpenEMRAuth:
+        """Return the process-wide instance configured from ``src.config``.
+
+        Tools share it so the token and the API connection pool survive
+        across tool calls instead of being rebuilt for every request.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
 
     # ------------------------------------------------------------------
     # Public API
@@ -70,7 +166,7 @@ class OpenEMRAuth:
 
            The newly registered client is **disabled** by default.  You must
            enable it before you can request tokens — either through the admin
-           UI or by calling :pymethod:`enable_client_via_docker`.
+           UI or by calling :pymethod:`enable_client_via_mysql`.
         """
         payload = {
             "application_type": "private",
@@ -82,12 +178,11 @@ class OpenEMRAuth:
             "scope": self.scopes,
         }
 
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.post(
-                f"{self.base_url}{_REGISTRATION_PATH}",
-                json=payload,
-            )
-            resp.raise_for_status()
+        resp = await _get_token_client().post(
+            f"{self.base_url}{_REGISTRATION_PATH}",
+            json=payload,
+        )
+        resp.raise_for_status()
 
         data = resp.json()
         self.client_id = data["client_id"]
@@ -95,6 +190,21 @@ class OpenEMRAuth:
         logger.info("Registered OAuth2 client: %s", self.client_id)
         return self.client_id, self.client_secret
 
+    async def enable_client_via_mysql(self, client_id: str) -> None:
+        """Enable an OAuth2 client with a direct UPDATE on the dev database.
+
+        This is a convenience for local development.  In production you would
+        enable the client via the OpenEMR admin UI.  Requires ``aiomysql``.
+        """
+        pool = await _get_mysql_pool()
+        async with pool.acquire() as conn, conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE oauth_clients SET is_enabled = 1 WHERE client_id = %s",
+                (client_id,),
+            )
+            await conn.commit()
+        logger.info("Enabled OAuth2 client %s", client_id)
+
     @staticmethod
     def enable_client_via_docker(
         client_id: str,
@@ -102,11 +212,18 @@ class OpenEMRAuth:
     ) -> None:
         """Enable an OAuth2 client by running SQL inside the Docker container.
 
-        This is a convenience for local development.  In production you would
-        enable the client via the OpenEMR admin UI.
+        .. deprecated::
+            Use :pymethod:`enable_client_via_mysql`, which runs a parameterised
+            query over a pooled connection instead of forking ``docker exec``.
         """
         import subprocess
 
+        warnings.warn(
+            "enable_client_via_docker is deprecated; use enable_client_via_mysql",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+
         sql = (
             f"UPDATE oauth_clients SET is_enabled = 1 "
             f"WHERE client_id = '{client_id}';"
@@ -125,31 +242,99 @@ class OpenEMRAuth:
 
     async def ensure_token(self) -> str:
         """Return a valid access token, refreshing or acquiring as needed."""
-        if self._access_token and time.time() < self._expires_at:
+        now = time.time()
+        if self._access_token and now < self._expires_at:
+            if now >= self._stale_at and (
+                self._refresh_task is None or self._refresh_task.done()
+            ):
+                self._refresh_task = asyncio.create_task(self._background_renew())
             return self._access_token
 
-        if self._refresh_token:
-            try:
-                return await self._refresh()
-            except httpx.HTTPStatusError:
-                logger.warning("Refresh failed, re-authenticating with password grant")
-
-        return await self._password_grant()
-
-    def get_client(self) -> _AuthenticatedClient:
-        """Return a context-managed ``httpx.AsyncClient`` with auth headers.
+        # Expired or never acquired.  If a background refresh is in flight
+        # this waits on the lock it holds and then picks up its result.
+        return await self._renew()
 
-        Usage::
+    async def invalidate(self, bad_token: str) -> str:
+        """Re-authenticate after *bad_token* was rejected, and return a token.
 
-            async with auth.get_client() as client:
-                resp = await client.get("/apis/default/api/patient")
+        If another caller already replaced *bad_token*, the cached token is
+        returned as is, so parallel 401s cost one password grant, not one each.
         """
-        return _AuthenticatedClient(self)
+        async with self._token_lock:
+            if self._access_token != bad_token:
+                return self._access_token
+            self._access_token = None
+            self._refresh_token = None
+            return await self._password_grant()
+
+    async def get(self, path: str, **kwargs: Any) -> httpx.Response:
+        """GET *path* with :attr:`client`, retrying once after a 401.
+
+        The rejected token goes to :meth:`invalidate`, which re-authenticates
+        unless a concurrent call already has; the retry's hook then picks up
+        the new token.  *kwargs* are passed through to ``client.get``.
+        """
+        resp = await self.client.get(path, **kwargs)
+        if resp.status_code == 401:
+            rejected = resp.request.headers["Authorization"].removeprefix("Bearer ")
+            await self.invalidate(rejected)
+            resp = await self.client.get(path, **kwargs)
+        return resp
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Persistent ``httpx.AsyncClient`` for the OpenEMR API.
+
+        Created on first use.  The Bearer token is injected on every request
+        via an event hook, so the client stays authenticated across refreshes.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                verify=False,
+                http2=True,
+                limits=_API_LIMITS,
+                timeout=_API_TIMEOUT,
+                event_hooks={"request": [self._inject_token]},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the API client's connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    async def _renew(self) -> str:
+        """Refresh (or re-acquire) the token unless it is still fresh."""
+        async with self._token_lock:
+            # Another coroutine may have refreshed while we waited.
+            if self._access_token and time.time() < self._stale_at:
+                return self._access_token
+
+            if self._refresh_token:
+                try:
+                    return await self._refresh()
+                except httpx.HTTPStatusError:
+                    logger.warning(
+                        "Refresh failed, re-authenticating with password grant"
+                    )
+
+            return await self._password_grant()
+
+    async def _background_renew(self) -> None:
+        """Run :pymethod:`_renew` off the request path, logging failures."""
+        try:
+            await self._renew()
+        except Exception:
+            # The current token is still valid; the next caller past expiry
+            # retries in the foreground and surfaces the error.
+            logger.exception("Background token refresh failed")
+
     async def _password_grant(self) -> str:
         """Acquire tokens using the resource-owner password grant."""
         if not self.client_id:
@@ -168,17 +353,16 @@ class OpenEMRAuth:
             "password": self.password,
         }
 
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.post(
-                f"{self.base_url}{_TOKEN_PATH}",
-                data=form,
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
+        resp = await _get_token_client().post(
+            f"{self.base_url}{_TOKEN_PATH}",
+            data=form,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if resp.status_code != 200:
+            logger.error(
+                "Token request failed (%s): %s", resp.status_code, resp.text
             )
-            if resp.status_code != 200:
-                logger.error(
-                    "Token request failed (%s): %s", resp.status_code, resp.text
-                )
-            resp.raise_for_status()
+        resp.raise_for_status()
 
         self._store_tokens(resp.json())
         logger.info("Obtained access token via password grant")
@@ -193,17 +377,16 @@ class OpenEMRAuth:
             "refresh_token": self._refresh_token,
         }
 
-        async with httpx.AsyncClient(verify=False) as client:
-            resp = await client.post(
-                f"{self.base_url}{_TOKEN_PATH}",
-                data=form,
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
+        resp = await _get_token_client().post(
+            f"{self.base_url}{_TOKEN_PATH}",
+            data=form,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if resp.status_code != 200:
+            logger.error(
+                "Refresh request failed (%s): %s", resp.status_code, resp.text
             )
-            if resp.status_code != 200:
-                logger.error(
-                    "Refresh request failed (%s): %s", resp.status_code, resp.text
-                )
-            resp.raise_for_status()
+        resp.raise_for_status()
 
         self._store_tokens(resp.json())
         logger.info("Refreshed access token")
@@ -213,35 +396,18 @@ class OpenEMRAuth:
         self._access_token = data["access_token"]
         self._refresh_token = data.get("refresh_token", self._refresh_token)
         expires_in = int(data.get("expires_in", 3600))
-        # Subtract 30 s buffer so we refresh before actual expiry.
-        self._expires_at = time.time() + expires_in - 30
-
-
-class _AuthenticatedClient:
-    """Async context manager that yields an ``httpx.AsyncClient`` with a
-    valid Bearer token.  Re-injects the token on every request via an
-    event hook so long-lived clients stay authenticated.
-    """
-
-    def __init__(self, auth: OpenEMRAuth) -> None:
-        self._auth = auth
-        self._client: httpx.AsyncClient | None = None
-
-    async def __aenter__(self) -> httpx.AsyncClient:
-        token = await self._auth.ensure_token()
-        self._client = httpx.AsyncClient(
-            base_url=self._auth.base_url,
-            verify=False,
-            headers={"Authorization": f"Bearer {token}"},
-            event_hooks={"request": [self._inject_token]},
+        issued = time.time()
+        # Jitter the stale point so workers that authenticated together do
+        # not all refresh in the same second.  Short-lived tokens go stale no
+        # earlier than half-way, or every call would start a refresh.
+        self._stale_at = max(
+            issued + expires_in / 2,
+            issued + expires_in - random.uniform(60, 75),
         )
-        return self._client
-
-    async def __aexit__(self, *exc) -> None:
-        if self._client:
-            await self._client.aclose()
+        # Small buffer so a token never expires in flight.
+        self._expires_at = issued + expires_in - 5
 
     async def _inject_token(self, request: httpx.Request) -> None:
         """Event hook: refresh the token if needed before each request."""
-        token = await self._auth.ensure_token()
+        token = await self.ensure_token()
         request.headers["Authorization"] = f"Bearer {token}"
@@ -1,22 +1,55 @@
 """Load environment variables from .env for the OpenEMR agent."""
 
 import os
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 # Load .env from the agent/ directory (one level up from src/)
 _env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(_env_path)
-
-ANTHROPIC_API_KEY: str = os.environ.get("ANTHROPIC_API_KEY", "")
-OPENAI_API_KEY: str = os.environ.get("OPENAI_API_KEY", "")
-OPENEMR_BASE_URL: str = os.environ.get("OPENEMR_BASE_URL", "http://localhost:8300")
-OPENEMR_CLIENT_ID: str = os.environ.get("OPENEMR_CLIENT_ID", "")
-OPENEMR_CLIENT_SECRET: str = os.environ.get("OPENEMR_CLIENT_SECRET", "")
-OPENEMR_USERNAME: str = os.environ.get("OPENEMR_USERNAME", "admin")
-OPENEMR_PASSWORD: str = os.environ.get("OPENEMR_PASSWORD", "pass")
-OPENEMR_SCOPES: str = os.environ.get(
-    "OPENEMR_SCOPES",
-    "openid api:oemr api:fhir user/patient.read user/AllergyIntolerance.read",
-)
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    ANTHROPIC_API_KEY: str
+    OPENAI_API_KEY: str
+    OPENEMR_BASE_URL: str
+    OPENEMR_CLIENT_ID: str
+    OPENEMR_CLIENT_SECRET: str
+    OPENEMR_USERNAME: str
+    OPENEMR_PASSWORD: str
+    OPENEMR_SCOPES: str
+
+
+@lru_cache(maxsize=1)
+def settings() -> Settings:
+    """Return the process-wide settings, reading ``.env`` on first call only."""
+    load_dotenv(_env_path, override=False)
+    env = os.environ.get
+    return Settings(
+        ANTHROPIC_API_KEY=env("ANTHROPIC_API_KEY", ""),
+        OPENAI_API_KEY=env("OPENAI_API_KEY", ""),
+        OPENEMR_BASE_URL=env("OPENEMR_BASE_URL", "http://localhost:8300"),
+        OPENEMR_CLIENT_ID=env("OPENEMR_CLIENT_ID", ""),
+        OPENEMR_CLIENT_SECRET=env("OPENEMR_CLIENT_SECRET", ""),
+        OPENEMR_USERNAME=env("OPENEMR_USERNAME", "admin"),
+        OPENEMR_PASSWORD=env("OPENEMR_PASSWORD", "pass"),
+        OPENEMR_SCOPES=env(
+            "OPENEMR_SCOPES",
+            "openid api:oemr api:fhir user/patient.read user/AllergyIntolerance.read",
+        ),
+    )
+
+
+# Module-level constants, kept for existing ``from src.config import ...`` callers.
+_settings = settings()
+ANTHROPIC_API_KEY: str = _settings.ANTHROPIC_API_KEY
+OPENAI_API_KEY: str = _settings.OPENAI_API_KEY
+OPENEMR_BASE_URL: str = _settings.OPENEMR_BASE_URL
+OPENEMR_CLIENT_ID: str = _settings.OPENEMR_CLIENT_ID
+OPENEMR_CLIENT_SECRET: str = _settings.OPENEMR_CLIENT_SECRET
+OPENEMR_USERNAME: str = _settings.OPENEMR_USERNAME
+OPENEMR_PASSWORD: str = _settings.OPENEMR_PASSWORD
+OPENEMR_SCOPES: str = _settings.OPENEMR_SCOPES
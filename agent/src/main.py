@@ -1,16 +1,56 @@
 """FastAPI application entry point for the OpenEMR AI agent."""
 
+import asyncio
+import time
 import uuid
+from contextlib import asynccontextmanager
 
 import httpx
+import orjson
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from src.agent.graph import run_agent
+from src.agent.graph import run_agent, run_agent_stream
+from src.auth import close_http_clients
 from src.config import OPENEMR_BASE_URL
 
-app = FastAPI(title="OpenEMR Agent", version="0.1.0")
+# Upper bound on a single chat message.  Rejecting oversized input here
+# bounds scope-guard and LLM cost without truncating what the guard sees.
+_MAX_MESSAGE_CHARS = 8192
+
+# /health reports a cached OpenEMR probe so frequent liveness checks neither
+# hammer OpenEMR nor stall for the full timeout while it is down.
+_HEALTH_TTL = 5.0
+_health_client: httpx.AsyncClient | None = None
+_health_lock = asyncio.Lock()
+_health_checked_at = 0.0
+_health_connected = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled HTTP connections when the server shuts down."""
+    yield
+    await close_http_clients()
+    if _health_client is not None:
+        await _health_client.aclose()
+
+
+def _get_health_client() -> httpx.AsyncClient:
+    """Return the client for OpenEMR health probes, creating it lazily.
+
+    A closed client (from an earlier app shutdown in this process) is
+    replaced, so a restarted app does not probe through a dead pool.
+    """
+    global _health_client
+    if _health_client is None or _health_client.is_closed:
+        _health_client = httpx.AsyncClient(timeout=2.0)
+    return _health_client
+
+
+app = FastAPI(title="OpenEMR Agent", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,7 +65,7 @@ app.add_middleware(
 
 
 class ChatRequest(BaseModel):
-    message: str
+    message: str = Field(max_length=_MAX_MESSAGE_CHARS)
     thread_id: str
 
 
@@ -49,13 +89,51 @@ async def chat(req: ChatRequest):
     )
 
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Stream the agent's reply as newline-delimited JSON events.
+
+    Each line is one event from :func:`run_agent_stream`.  The thread id is
+    returned in the ``X-Thread-Id`` header since the body starts streaming
+    before the turn completes.
+    """
+    thread_id = req.thread_id or uuid.uuid4().hex
+
+    async def events():
+        async for event in run_agent_stream(req.message, thread_id=thread_id):
+            yield orjson.dumps(event) + b"\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"X-Thread-Id": thread_id},
+    )
+
+
+async def _probe_openemr() -> bool:
+    """Return whether OpenEMR answered the FHIR metadata probe, cached briefly."""
+    global _health_checked_at, _health_connected
+    if time.monotonic() - _health_checked_at < _HEALTH_TTL:
+        return _health_connected
+
+    async with _health_lock:
+        # Another request may have probed while we waited.
+        if time.monotonic() - _health_checked_at < _HEALTH_TTL:
+            return _health_connected
+
+        connected = False
+        try:
+            resp = await _get_health_client().get(
+                f"{OPENEMR_BASE_URL}/apis/default/fhir/metadata"
+            )
+            connected = resp.status_code == 200
+        except Exception:
+            pass
+        _health_connected = connected
+        _health_checked_at = time.monotonic()
+        return connected
+
+
 @app.get("/health")
 async def health():
-    openemr_connected = False
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(f"{OPENEMR_BASE_URL}/apis/default/fhir/metadata")
-            openemr_connected = resp.status_code == 200
-    except Exception:
-        pass
-    return {"status": "healthy", "openemr_connected": openemr_connected}
+    return {"status": "healthy", "openemr_connected": await _probe_openemr()}
@@ -7,16 +7,21 @@ FHIR API to fetch AllergyIntolerance resources for a given patient.
 from __future__ import annotations
 
 import asyncio
+import html
+import io
 import logging
 import re
 import sys
+from collections.abc import Iterable
 from pathlib import Path
 
 import httpx
+import orjson
 from langchain_core.tools import tool
 
 # Ensure the agent package is importable when running as a script.
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from src.auth.oauth2 import OpenEMRAuth
 
@@ -24,85 +29,84 @@ logger = logging.getLogger(__name__)
 
 _FHIR_PREFIX = "/apis/default/fhir"
 
+_TAG_RE = re.compile(r"<[^>]+>")
 
-def _strip_html(html: str) -> str:
-    """Remove HTML tags and return plain text."""
-    return re.sub(r"<[^>]+>", "", html).strip()
+# Bundles larger than this are parsed in a worker thread so a long parse
+# does not stall other requests on the event loop.
+_THREAD_PARSE_THRESHOLD = 64
 
 
-def _is_absent_reason(codings: list[dict]) -> bool:
-    """Check if the coding uses a data-absent-reason system (i.e. no real code)."""
-    return any(
-        "data-absent-reason" in (c.get("system") or "") for c in codings
-    )
+def _strip_html(markup: str) -> str:
+    """Remove HTML tags, decode entities, and return plain text."""
+    return html.unescape(_TAG_RE.sub("", markup)).strip()
 
 
 def _parse_allergy(resource: dict) -> dict:
     """Extract relevant fields from a FHIR AllergyIntolerance resource."""
+    get = resource.get
+
     # Substance name — OpenEMR often puts a data-absent-reason in code.coding
-    # and stores the actual name in text.div as HTML.
-    code = resource.get("code", {})
-    codings = code.get("coding", [])
-
-    # Prefer code.text or code.coding[0].display when it's a real code
-    substance = None
-    if code.get("text"):
-        substance = code["text"]
-    elif codings and not _is_absent_reason(codings):
+    # and stores the actual name in text.div as HTML.  Prefer code.text, then
+    # code.coding[0].display when it's a real code, then the narrative.
+    code = get("code") or {}
+    codings = code.get("coding") or ()
+    substance = code.get("text")
+    if not substance and codings and not any(
+        "data-absent-reason" in c.get("system", "") for c in codings
+    ):
         substance = codings[0].get("display")
-
-    # Fall back to the narrative text.div (strip HTML tags)
     if not substance:
-        text_div = resource.get("text", {}).get("div", "")
+        text_div = (get("text") or {}).get("div")
         if text_div:
             substance = _strip_html(text_div)
 
-    substance = substance or "Unknown substance"
-
     # Category (medication, food, environment)
-    categories = resource.get("category", [])
-    category = categories[0] if categories else "unknown"
-
-    # Criticality
-    criticality = resource.get("criticality", "unknown")
+    categories = get("category")
 
-    # Reactions
+    # Reactions: manifestation display/text plus any free-text description,
+    # each reported once.
     reactions: list[str] = []
-    for reaction_entry in resource.get("reaction", []):
-        manifestations = reaction_entry.get("manifestation", [])
-        for manifestation in manifestations:
-            m_codings = manifestation.get("coding", [])
-            text = (
-                m_codings[0].get("display") if m_codings else None
-            ) or manifestation.get("text")
-            if text:
+    seen: set[str] = set()
+    for reaction_entry in get("reaction", ()):
+        for manifestation in reaction_entry.get("manifestation", ()):
+            m_codings = manifestation.get("coding")
+            text = (m_codings and m_codings[0].get("display")) or manifestation.get("text")
+            if text and text not in seen:
+                seen.add(text)
                 reactions.append(text)
-        # Also check the description field
         description = reaction_entry.get("description")
-        if description and description not in reactions:
+        if description and description not in seen:
+            seen.add(description)
             reactions.append(description)
 
     return {
-        "substance": substance,
-        "category": category,
-        "criticality": criticality,
-        "reactions": reactions if reactions else None,
+        "substance": substance or "Unknown substance",
+        "category": categories[0] if categories else "unknown",
+        "criticality": get("criticality", "unknown"),
+        "reactions": reactions or None,
     }
 
 
-def _format_allergies(allergies: list[dict]) -> str:
-    """Format a list of parsed allergy dicts into a readable string."""
-    lines: list[str] = []
-    lines.append(f"Found {len(allergies)} documented allergy(ies):\n")
+def _format_allergies(allergies: Iterable[dict]) -> str:
+    """Format parsed allergy dicts into a readable string.
+
+    *allergies* is consumed once, so a lazy iterator works without first
+    being materialised into a list.
+    """
+    buf = io.StringIO()
+    count = 0
 
     for a in allergies:
-        lines.append(f"- {a['substance']}")
-        lines.append(f"  Category: {a['category']}  |  Criticality: {a['criticality']}")
+        count += 1
+        buf.write(
+            f"- {a['substance']}\n"
+            f"  Category: {a['category']}  |  Criticality: {a['criticality']}\n"
+        )
         if a["reactions"]:
-            lines.append(f"  Reactions: {', '.join(a['reactions'])}")
-        lines.append("")
+            buf.write(f"  Reactions: {', '.join(a['reactions'])}\n")
+        buf.write("\n")
 
-    return "\n".join(lines).strip()
+    return f"Found {count} documented allergy(ies):\n\n{buf.getvalue()}".rstrip()
 
 
 @tool
@@ -121,28 +125,13 @@ async def allergy_check(patient_uuid: str) -> str:
     if not patient_uuid or not patient_uuid.strip():
         return "Error: patient_uuid is required."
 
-    auth = OpenEMRAuth()
-
     try:
-        async with auth.get_client() as client:
-            resp = await client.get(
-                f"{_FHIR_PREFIX}/AllergyIntolerance",
-                params={"patient": patient_uuid},
-                timeout=10.0,
-            )
-
-            if resp.status_code == 401:
-                # Force a fresh token and retry once.
-                auth._access_token = None
-                auth._refresh_token = None
-                async with auth.get_client() as retry_client:
-                    resp = await retry_client.get(
-                        f"{_FHIR_PREFIX}/AllergyIntolerance",
-                        params={"patient": patient_uuid},
-                        timeout=10.0,
-                    )
-
-            resp.raise_for_status()
+        resp = await OpenEMRAuth.instance().get(
+            f"{_FHIR_PREFIX}/AllergyIntolerance",
+            params={"patient": patient_uuid},
+            timeout=10.0,
+        )
+        resp.raise_for_status()
 
     except httpx.TimeoutException:
         return "Unable to reach medical records system. Please try again."
@@ -150,7 +139,7 @@ async def allergy_check(patient_uuid: str) -> str:
         logger.error("Allergy check API error: %s", exc)
         return "Unable to reach medical records system. Please try again."
 
-    body = resp.json()
+    body = orjson.loads(resp.content)
 
     # FHIR Bundle: entries live under "entry"; an empty bundle may omit the key.
     entries = body.get("entry", [])
@@ -158,8 +147,10 @@ async def allergy_check(patient_uuid: str) -> str:
     if not entries:
         return "No allergies documented for this patient."
 
-    allergies = [_parse_allergy(entry.get("resource", entry)) for entry in entries]
-
+    # Parse lazily straight into the formatter; no intermediate list.
+    allergies = (_parse_allergy(entry.get("resource", entry)) for entry in entries)
+    if len(entries) > _THREAD_PARSE_THRESHOLD:
+        return await asyncio.to_thread(_format_allergies, allergies)
     return _format_allergies(allergies)
 
 
@@ -0,0 +1,55 @@
+"""Small in-process caches shared by the tools."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+MISSING: Any = object()
+"""Sentinel returned by :pymethod:`TTLCache.get` on a miss."""
+
+
+class TTLCache:
+    """LRU cache whose entries also expire *ttl* seconds after being set.
+
+    Not thread-safe; intended for use from a single event loop.  *clock*
+    returns the current time in seconds (injectable for tests).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for *key*, or *default* if absent or expired."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if self._clock() >= expires_at:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store *value* under *key*, evicting the least recently used entry."""
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -14,6 +14,7 @@ This implementation uses openFDA label data as the interaction source instead.
 from __future__ import annotations
 
 import asyncio
+import io
 import itertools
 import logging
 import re
@@ -22,21 +23,95 @@ from pathlib import Path
 from urllib.parse import quote
 
 import httpx
+import orjson
 from langchain_core.tools import tool
 
 # Ensure the agent package is importable when running as a script.
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.tools.cache import MISSING, TTLCache
 
 logger = logging.getLogger(__name__)
 
 _RXNORM_BASE = "https://rxnav.nlm.nih.gov/REST"
 _OPENFDA_BASE = "https://api.fda.gov/drug/label.json"
 
+# All lookups for one check fan out at once; HTTP/2 multiplexes them over a
+# single connection per host instead of queueing behind a small pool.
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+# RxNorm names and FDA labelling change on the order of weeks, so answers are
+# kept for a day.  Only definitive answers (including "not found") are
+# cached; transport errors are retried on the next call.
+_CACHE_TTL = 24 * 3600
+_rxnorm_cache = TTLCache(maxsize=1024, ttl=_CACHE_TTL)
+_label_cache = TTLCache(maxsize=1024, ttl=_CACHE_TTL)
+
+# openFDA labels fetched and merged per drug (see ``_fetch_label``).
+_LABELS_PER_DRUG = 5
+
+# Leading section numbers like "7 DRUG INTERACTIONS" or "7.1 ...".
+_SECTION_NUM_RE = re.compile(r"^\d+(?:\.\d+)?\s+(?:DRUG INTERACTIONS\s*)?")
+_PARA_SPLIT_RE = re.compile(r"\n{2,}|\r\n{2,}")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=\.)\s+(?=[A-Z])")
+
+
+def cache_clear() -> None:
+    """Drop all cached RxNorm names and labels (for tests)."""
+    _rxnorm_cache.clear()
+    _label_cache.clear()
+
+
+def _http_client() -> httpx.AsyncClient:
+    """Return a client for one check's RxNorm and openFDA requests."""
+    return httpx.AsyncClient(
+        http2=True, limits=_HTTP_LIMITS, timeout=httpx.Timeout(15.0),
+    )
+
 
 # ── RxNorm helpers ───────────────────────────────────────────────────────────
 
+async def _approximate_match(client: httpx.AsyncClient, drug_name: str) -> str | None:
+    """Return RxNorm's name for *drug_name* if approximateTerm matches it exactly.
+
+    One round trip instead of the rxcui + properties pair.  ``option=1``
+    restricts candidates to RxNorm concepts, so the top hit is never
+    another vocabulary's string.  Fuzzy hits (misspellings, brand-to-generic
+    guesses) are ignored so the result is never looser than the exact-name
+    lookup.
+    """
+    resp = await client.get(
+        f"{_RXNORM_BASE}/approximateTerm.json",
+        params={"term": drug_name, "maxEntries": 1, "option": 1},
+        timeout=10.0,
+    )
+    resp.raise_for_status()
+    body = orjson.loads(resp.content)
+    candidates = body.get("approximateGroup", {}).get("candidate") or []
+    wanted = drug_name.strip().lower()
+    for candidate in candidates:
+        name = candidate.get("name")
+        if name and name.lower() == wanted:
+            return name
+    return None
+
+
 async def _resolve_drug_name(client: httpx.AsyncClient, drug_name: str) -> str | None:
     """Normalise a drug name via RxNorm.  Returns the canonical name or *None*."""
+    cached = _rxnorm_cache.get(drug_name)
+    if cached is not MISSING:
+        return cached
+
+    try:
+        name = await _approximate_match(client, drug_name)
+    except (httpx.HTTPError, ValueError):
+        name = None
+    if name is not None:
+        _rxnorm_cache.set(drug_name, name)
+        return name
+
+    # Fall back to the exact-name lookup followed by a properties fetch.
     try:
         resp = await client.get(
             f"{_RXNORM_BASE}/rxcui.json",
@@ -44,68 +119,100 @@ async def _resolve_drug_name(client: httpx.AsyncClient, drug_name: str) -> str |
             timeout=10.0,
         )
         resp.raise_for_status()
-        body = resp.json()
+        body = orjson.loads(resp.content)
         ids = body.get("idGroup", {}).get("rxnormId")
         if not ids:
-            return None
-        # Fetch the canonical name for the resolved RxCUI.
-        prop_resp = await client.get(
-            f"{_RXNORM_BASE}/rxcui/{ids[0]}/properties.json",
-            timeout=10.0,
-        )
-        prop_resp.raise_for_status()
-        return prop_resp.json().get("properties", {}).get("name") or drug_name
+            name = None
+        else:
+            # Fetch the canonical name for the resolved RxCUI.
+            prop_resp = await client.get(
+                f"{_RXNORM_BASE}/rxcui/{ids[0]}/properties.json",
+                timeout=10.0,
+            )
+            prop_resp.raise_for_status()
+            name = orjson.loads(prop_resp.content).get("properties", {}).get("name") or drug_name
     except (httpx.HTTPError, KeyError):
         return None
 
+    _rxnorm_cache.set(drug_name, name)
+    return name
+
 
 # ── openFDA helpers ──────────────────────────────────────────────────────────
 
 def _clean_label_text(raw: str) -> str:
     """Strip common label noise (section numbers, bullet chars, etc.)."""
-    # Remove leading section numbers like "7 DRUG INTERACTIONS" or "7.1 ..."
-    text = re.sub(r"^\d+(?:\.\d+)?\s+(?:DRUG INTERACTIONS\s*)?", "", raw)
-    return text.strip()
+    return _SECTION_NUM_RE.sub("", raw).strip()
+
 
+async def _fetch_label(client: httpx.AsyncClient, drug: str) -> str | None:
+    """Return the drug-interactions text of *drug*'s openFDA labels, if any.
+
+    Only labels that have a ``drug_interactions`` section are requested (many
+    OTC labels lack one), and the sections of the top few are merged, since
+    different manufacturers' labels do not all list the same interactions.
+    """
+    cached = _label_cache.get(drug)
+    if cached is not MISSING:
+        return cached
 
-async def _search_label_interactions(
-    client: httpx.AsyncClient,
-    drug_a: str,
-    drug_b: str,
-) -> str | None:
-    """Query openFDA for drug_a's label and look for drug_b in the interaction section."""
     try:
-        # Build the URL manually — openFDA expects literal '+AND+' in the
-        # search parameter but httpx's param encoding would percent-encode
-        # the '+' characters, which breaks the query.
-        search = (
-            f'openfda.generic_name:"{quote(drug_a)}"'
-            f'+AND+drug_interactions:"{quote(drug_b)}"'
+        url = (
+            f'{_OPENFDA_BASE}?search=openfda.generic_name:"{quote(drug)}"'
+            f"+AND+_exists_:drug_interactions&limit={_LABELS_PER_DRUG}"
         )
-        url = f"{_OPENFDA_BASE}?search={search}&limit=1"
         resp = await client.get(url, timeout=15.0)
         if resp.status_code == 404:
             # openFDA returns 404 when no results match.
-            return None
-        resp.raise_for_status()
-        body = resp.json()
+            body = {}
+        else:
+            resp.raise_for_status()
+            body = orjson.loads(resp.content)
     except (httpx.HTTPError, ValueError):
         return None
 
-    results = body.get("results", [])
-    if not results:
-        return None
+    sections = dict.fromkeys(
+        section
+        for result in body.get("results", [])
+        for section in result.get("drug_interactions", [])
+    )
+    label = "\n\n".join(sections) or None
+    _label_cache.set(drug, label)
+    return label
+
+
+async def _fetch_all_labels(
+    client: httpx.AsyncClient, drugs: list[str],
+) -> dict[str, str | None]:
+    """Return ``{drug: drug_interactions text or None}`` for every drug.
+
+    One query per drug, all in flight at once over the shared HTTP/2
+    connection, so the wall time is about one round trip.  A single
+    ``generic_name:(A OR B ...)`` query cannot do better: its ``limit`` is
+    shared, so one drug with many labels crowds out the rest, and raising
+    it pulls down whole labels (tens of kB each) for nothing.
+    """
+    results = await asyncio.gather(*(_fetch_label(client, d) for d in drugs))
+    return dict(zip(drugs, results))
 
-    sections = results[0].get("drug_interactions", [])
-    if not sections:
-        return None
 
-    # The section is one big blob.  Extract the paragraph that mentions drug_b.
-    full_text = sections[0]
-    paragraphs = re.split(r"\n{2,}|\r\n{2,}", full_text)
+def _drug_name_pattern(drugs: list[str]) -> re.Pattern[str]:
+    """Compile one case-insensitive pattern matching any of *drugs* as a word.
+
+    Longer names come first so "potassium chloride" wins over "potassium".
+    """
+    alternation = "|".join(
+        re.escape(d.lower()) for d in sorted(set(drugs), key=len, reverse=True)
+    )
+    return re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+
+
+def _extract_interaction(full_text: str, drug_b: str) -> str:
+    """Pull the paragraph(s) of a label's interaction section that mention drug_b."""
+    paragraphs = _PARA_SPLIT_RE.split(full_text)
     # If the text isn't really multi-paragraph, split on sentence-ish boundaries.
     if len(paragraphs) <= 1:
-        paragraphs = re.split(r"(?<=\.)\s+(?=[A-Z])", full_text)
+        paragraphs = _SENTENCE_SPLIT_RE.split(full_text)
 
     drug_b_lower = drug_b.lower()
     relevant = [
@@ -128,28 +235,25 @@ def _format_results(
     unresolved: list[str],
 ) -> str:
     """Format parsed interaction data into a readable string."""
-    lines: list[str] = []
+    buf = io.StringIO()
 
     if unresolved:
         for name in unresolved:
-            lines.append(
-                f"Could not find drug: {name}. Please verify spelling."
-            )
-        lines.append("")
+            buf.write(f"Could not find drug: {name}. Please verify spelling.\n")
+        buf.write("\n")
 
     if interactions:
-        lines.append(f"Found {len(interactions)} interaction(s):\n")
+        buf.write(f"Found {len(interactions)} interaction(s):\n\n")
         for ix in interactions:
-            lines.append(f"- {ix['drug_pair']}")
-            lines.append(f"  Severity: {ix['severity']}")
-            lines.append(f"  {ix['description']}")
-            lines.append("")
+            buf.write(
+                f"- {ix['drug_pair']}\n"
+                f"  Severity: {ix['severity']}\n"
+                f"  {ix['description']}\n\n"
+            )
     elif not unresolved:
-        lines.append(
-            "No known interactions found between these medications."
-        )
+        buf.write("No known interactions found between these medications.")
 
-    return "\n".join(lines).strip()
+    return buf.getvalue().rstrip()
 
 
 # ── Tool ─────────────────────────────────────────────────────────────────────
@@ -173,15 +277,15 @@ async def drug_interaction_check(drug_names: list[str]) -> str:
     canonical: dict[str, str] = {}  # original -> canonical name
     unresolved: list[str] = []
 
-    async with httpx.AsyncClient(verify=True) as client:
-        # 1. Normalise drug names via RxNorm (concurrently).
-        resolve_tasks = {
-            name: _resolve_drug_name(client, name) for name in drug_names
-        }
+    async with _http_client() as client:
+        # 1. Normalise drug names via RxNorm (concurrently).  Repeated
+        #    inputs are looked up once.
+        names = list(dict.fromkeys(drug_names))
         results = await asyncio.gather(
-            *resolve_tasks.values(), return_exceptions=True,
+            *(_resolve_drug_name(client, name) for name in names),
+            return_exceptions=True,
         )
-        for name, result in zip(resolve_tasks.keys(), results):
+        for name, result in zip(names, results):
             if isinstance(result, Exception):
                 logger.error("RxNorm lookup failed for %s: %s", name, result)
                 unresolved.append(name)
@@ -190,38 +294,40 @@ async def drug_interaction_check(drug_names: list[str]) -> str:
             else:
                 canonical[name] = result
 
-        if len(canonical) < 2:
+        # Inputs that resolve to the same drug (e.g. different spellings)
+        # are checked once, and never against themselves.
+        resolved_names = list(dict.fromkeys(canonical.values()))
+        if len(resolved_names) < 2:
             return _format_results([], unresolved)
 
-        # 2. Check every ordered pair via openFDA labels (concurrently).
-        #    We check both directions (A's label for B, and B's label for A)
-        #    because labelling isn't always symmetric.
-        resolved_names = list(canonical.values())
-        pair_tasks: dict[tuple[str, str], asyncio.Task] = {}
-        for a, b in itertools.combinations(resolved_names, 2):
-            pair_tasks[(a, b)] = _search_label_interactions(client, a, b)
-            pair_tasks[(b, a)] = _search_label_interactions(client, b, a)
-
-        pair_results = await asyncio.gather(
-            *pair_tasks.values(), return_exceptions=True,
-        )
+        # 2. Fetch each drug's labels once (concurrently).
+        fetched = await _fetch_all_labels(client, resolved_names)
+
+    labels = {name: text for name, text in fetched.items() if text}
+
+    # 3. Scan each label once for every other drug's name.
+    pattern = _drug_name_pattern(resolved_names)
+    mentioned = {
+        name: {m.group().lower() for m in pattern.finditer(text)}
+        for name, text in labels.items()
+    }
 
-    # 3. Collate results — deduplicate per unordered pair.
-    seen_pairs: set[tuple[str, str]] = set()
+    # 4. Collate in pair order — check both directions (A's label for B, and
+    #    B's label for A) because labelling isn't always symmetric, and keep
+    #    the first hit.  combinations() yields each unordered pair once, so the
+    #    canonical key is computed once per pair and no seen-set is needed.
     interactions: list[dict] = []
 
-    for (a, b), result in zip(pair_tasks.keys(), pair_results):
-        if isinstance(result, Exception) or result is None:
-            continue
-        pair_key = tuple(sorted((a, b)))
-        if pair_key in seen_pairs:
-            continue
-        seen_pairs.add(pair_key)
-        interactions.append({
-            "drug_pair": f"{pair_key[0]} + {pair_key[1]}",
-            "severity": "see description",
-            "description": result,
-        })
+    for a, b in itertools.combinations(resolved_names, 2):
+        first, second = (a, b) if a < b else (b, a)
+        for owner, other in ((a, b), (b, a)):
+            if other.lower() in mentioned.get(owner, ()):
+                interactions.append({
+                    "drug_pair": f"{first} + {second}",
+                    "severity": "see description",
+                    "description": _extract_interaction(labels[owner], other),
+                })
+                break
 
     return _format_results(interactions, unresolved)
 
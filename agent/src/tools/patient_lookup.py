@@ -13,18 +13,31 @@ from pathlib import Path
 from typing import Optional
 
 import httpx
+import orjson
 from langchain_core.tools import tool
 
 # Ensure the agent package is importable when running as a script.
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from src.auth.oauth2 import OpenEMRAuth
+from src.tools.cache import MISSING, TTLCache
 
 logger = logging.getLogger(__name__)
 
 _API_PREFIX = "/apis/default/api"
 _MAX_RESULTS = 5
 
+# Agent loops often re-issue the same lookup within a turn or two.  Results
+# are cached briefly, keyed on the search fields, as the final tool string.
+# Errors are never cached.
+_cache = TTLCache(maxsize=256, ttl=30)
+
+
+def cache_clear() -> None:
+    """Drop all cached lookups (for tests, or after editing patient data)."""
+    _cache.clear()
+
 
 def _format_patient(patient: dict) -> dict:
     """Extract the fields we care about from a raw API patient record."""
@@ -32,18 +45,27 @@ def _format_patient(patient: dict) -> dict:
     city = patient.get("city", "")
     state = patient.get("state", "")
     postal = patient.get("postal_code", "")
-    address_parts = [p for p in (street, city, state, postal) if p]
 
     return {
         "uuid": patient.get("uuid", ""),
         "name": f"{patient.get('fname', '')} {patient.get('lname', '')}".strip(),
         "dob": patient.get("DOB", ""),
         "sex": patient.get("sex", ""),
-        "phone": patient.get("phone_home", "") or patient.get("phone_cell", ""),
-        "address": ", ".join(address_parts),
+        "phone": patient.get("phone_home") or patient.get("phone_cell") or "",
+        "address": ", ".join(filter(None, (street, city, state, postal))),
     }
 
 
+def _render_patient(p: dict) -> str:
+    """Render one formatted patient as a block of text lines."""
+    phone = f"\n  Phone: {p['phone']}" if p["phone"] else ""
+    address = f"\n  Address: {p['address']}" if p["address"] else ""
+    return (
+        f"- {p['name']} (UUID: {p['uuid']})\n"
+        f"  DOB: {p['dob']}  Sex: {p['sex']}{phone}{address}"
+    )
+
+
 @tool
 async def patient_lookup(
     first_name: Optional[str] = None,
@@ -66,6 +88,11 @@ async def patient_lookup(
     if not any([first_name, last_name, dob]):
         return "Error: At least one search field (first_name, last_name, or dob) must be provided."
 
+    cache_key = (first_name, last_name, dob)
+    cached = _cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
     params: dict[str, str] = {}
     if first_name:
         params["fname"] = first_name
@@ -73,29 +100,17 @@ async def patient_lookup(
         params["lname"] = last_name
     if dob:
         params["DOB"] = dob
-
-    auth = OpenEMRAuth()
+    # Let OpenEMR paginate; one row past the display limit tells us whether
+    # there are more matches without transferring all of them.
+    params["_limit"] = str(_MAX_RESULTS + 1)
 
     try:
-        async with auth.get_client() as client:
-            resp = await client.get(
-                f"{_API_PREFIX}/patient",
-                params=params,
-                timeout=10.0,
-            )
-
-            if resp.status_code == 401:
-                # Force a fresh token and retry once.
-                auth._access_token = None
-                auth._refresh_token = None
-                async with auth.get_client() as retry_client:
-                    resp = await retry_client.get(
-                        f"{_API_PREFIX}/patient",
-                        params=params,
-                        timeout=10.0,
-                    )
-
-            resp.raise_for_status()
+        resp = await OpenEMRAuth.instance().get(
+            f"{_API_PREFIX}/patient",
+            params=params,
+            timeout=10.0,
+        )
+        resp.raise_for_status()
 
     except httpx.TimeoutException:
         return "Unable to reach medical records system. Please try again."
@@ -103,34 +118,29 @@ async def patient_lookup(
         logger.error("Patient lookup API error: %s", exc)
         return "Unable to reach medical records system. Please try again."
 
-    body = resp.json()
+    body = orjson.loads(resp.content)
 
     # The API wraps results in a "data" key.
     patients = body if isinstance(body, list) else body.get("data", [])
 
     if not patients:
-        return "No patients found matching criteria."
+        result = "No patients found matching criteria."
+        _cache.set(cache_key, result)
+        return result
 
     formatted = [_format_patient(p) for p in patients[:_MAX_RESULTS]]
 
-    lines: list[str] = []
     if len(patients) > _MAX_RESULTS:
-        lines.append(
-            f"Multiple patients found ({len(patients)} total, showing first {_MAX_RESULTS}):\n"
-        )
+        header = f"More than {_MAX_RESULTS} patients found (showing first {_MAX_RESULTS}):\n\n"
     elif len(patients) > 1:
-        lines.append(f"Multiple patients found ({len(patients)}):\n")
-
-    for p in formatted:
-        lines.append(f"- {p['name']} (UUID: {p['uuid']})")
-        lines.append(f"  DOB: {p['dob']}  Sex: {p['sex']}")
-        if p["phone"]:
-            lines.append(f"  Phone: {p['phone']}")
-        if p["address"]:
-            lines.append(f"  Address: {p['address']}")
-        lines.append("")
-
-    return "\n".join(lines).strip()
+        header = f"Multiple patients found ({len(patients)}):\n\n"
+    else:
+        header = ""
+
+    rendered = "\n\n".join(_render_patient(p) for p in formatted)
+    result = f"{header}{rendered}".strip()
+    _cache.set(cache_key, result)
+    return result
 
 
 # ── Standalone test ──────────────────────────────────────────────────────────
@@ -7,6 +7,7 @@ classification later.
 
 from __future__ import annotations
 
+import functools
 import re
 
 # ── Category constants ───────────────────────────────────────────────────────
@@ -18,7 +19,7 @@ TREATMENT_REQUEST = "TREATMENT_REQUEST"
 OUT_OF_SCOPE = "OUT_OF_SCOPE"
 
 # ── Configurable keyword lists ───────────────────────────────────────────────
-# Each list contains lowercased phrases.  Checked against the lowercased input.
+# Each list contains lowercased phrases, matched case-insensitively.
 # Order matters: more restrictive categories are checked first so that a query
 # like "diagnose drug interaction" is blocked as a diagnosis request rather
 # than allowed as clinical support.
@@ -89,13 +90,83 @@ CLINICAL_DISCLAIMER = (
 # ── Classification ───────────────────────────────────────────────────────────
 
 
-def _matches(text: str, keywords: list[str]) -> bool:
-    """Return True if *text* contains any of the *keywords* as whole phrases."""
+# Categories in priority order: more restrictive first, so that a query
+# hitting several is classified by the most dangerous one.
+_CATEGORY_KEYWORDS: list[tuple[str, list[str]]] = [
+    (DIAGNOSIS_REQUEST, DIAGNOSIS_KEYWORDS),
+    (TREATMENT_REQUEST, TREATMENT_KEYWORDS),
+    (CLINICAL_SUPPORT, CLINICAL_SUPPORT_KEYWORDS),
+    (DATA_RETRIEVAL, DATA_RETRIEVAL_KEYWORDS),
+]
+
+
+def _trie_alternation(keywords: list[str]) -> str:
+    """Return a regex matching exactly *keywords*, with shared prefixes merged.
+
+    e.g. ``["allergy", "allergies", "allergic"]`` becomes
+    ``allerg(?:i(?:c|es)|y)``, so the engine walks a common prefix once
+    instead of retrying it for every keyword.
+    """
+    trie: dict = {}
     for kw in keywords:
-        # Use word-boundary matching so "list" doesn't match "specialist".
-        if re.search(rf"\b{re.escape(kw)}\b", text):
-            return True
-    return False
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end-of-keyword marker
+
+    def render(node: dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if "" in node:
+            return "(?:" + "|".join(branches) + ")?"
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return render(trie)
+
+
+def _combined_pattern() -> re.Pattern[str]:
+    """Compile every category into one case-insensitive pattern.
+
+    Each category is a named group (``c0`` = highest priority).  The whole
+    alternation sits in a lookahead, so ``finditer`` reports the
+    highest-priority keyword starting at *every* position, including ones
+    that overlap an earlier hit.  Word boundaries keep "list" from matching
+    "specialist".
+    """
+    groups = "|".join(
+        f"(?P<c{i}>{_trie_alternation(keywords)})"
+        for i, (_, keywords) in enumerate(_CATEGORY_KEYWORDS)
+    )
+    # Cheap prefilter: a one-character class in front lets the engine skip
+    # positions that cannot start any keyword before trying the alternation.
+    first = re.escape("".join(sorted(_KEYWORD_FIRST_CHARS)))
+    return re.compile(rf"(?=[{first}])(?=\b(?:{groups})\b)", re.IGNORECASE)
+
+
+# Built once at import; rebuild both after editing the keyword lists.
+_KEYWORD_FIRST_CHARS = frozenset(
+    c
+    for _, keywords in _CATEGORY_KEYWORDS
+    for kw in keywords
+    for c in (kw[0].lower(), kw[0].upper())
+)
+_KEYWORD_RE = _combined_pattern()
+
+# Classification results, prebuilt and indexed by priority; the last slot is
+# the out-of-scope fallback.  Tuples are immutable, so sharing them is safe.
+_RESULTS: tuple[tuple[str, str | None], ...] = (
+    *((category, BLOCK_MESSAGES.get(category)) for category, _ in _CATEGORY_KEYWORDS),
+    (OUT_OF_SCOPE, BLOCK_MESSAGES[OUT_OF_SCOPE]),
+)
+_OUT_OF_SCOPE_INDEX = len(_RESULTS) - 1
+
+# The same results in ``apply_scope_guard``'s (is_allowed, message) shape.
+_GUARD_RESULTS: tuple[tuple[bool, str | None], ...] = tuple(
+    (message is None, message) for _, message in _RESULTS
+)
 
 
 def classify_input(user_input: str) -> tuple[str, str | None]:
@@ -108,24 +179,7 @@ def classify_input(user_input: str) -> tuple[str, str | None]:
         A tuple of (category, block_message_or_none).
         ``block_message`` is ``None`` for allowed categories.
     """
-    text = user_input.lower().strip()
-
-    # Check blocked categories first (order: most dangerous → least).
-    if _matches(text, DIAGNOSIS_KEYWORDS):
-        return DIAGNOSIS_REQUEST, BLOCK_MESSAGES[DIAGNOSIS_REQUEST]
-
-    if _matches(text, TREATMENT_KEYWORDS):
-        return TREATMENT_REQUEST, BLOCK_MESSAGES[TREATMENT_REQUEST]
-
-    # Allowed categories.
-    if _matches(text, CLINICAL_SUPPORT_KEYWORDS):
-        return CLINICAL_SUPPORT, None
-
-    if _matches(text, DATA_RETRIEVAL_KEYWORDS):
-        return DATA_RETRIEVAL, None
-
-    # Nothing matched → out of scope.
-    return OUT_OF_SCOPE, BLOCK_MESSAGES[OUT_OF_SCOPE]
+    return _RESULTS[_classify_index(user_input)]
 
 
 def apply_scope_guard(user_input: str) -> tuple[bool, str | None]:
@@ -138,9 +192,33 @@ def apply_scope_guard(user_input: str) -> tuple[bool, str | None]:
         A tuple of (is_allowed, block_message_if_not_allowed).
         When ``is_allowed`` is ``True``, the second element is ``None``.
     """
-    category, block_message = classify_input(user_input)
-
-    if block_message is not None:
-        return False, block_message
-
-    return True, None
+    return _GUARD_RESULTS[_classify_index(user_input)]
+
+
+def _classify_index(user_input: str) -> int:
+    """Return the index into ``_RESULTS`` / ``_GUARD_RESULTS`` for *user_input*."""
+    # Matching ignores case and surrounding whitespace, so normalising the
+    # key lets "Check allergies" and "check allergies " share a cache slot.
+    return _classify_cached(user_input.lower().strip())
+
+
+# Identical prompts (retries, canned queries) classify identically, so
+# repeat lookups are served from a bounded LRU cache.  Call
+# ``_classify_cached.cache_clear()`` after editing the keyword lists.
+@functools.lru_cache(maxsize=2048)
+def _classify_cached(user_input: str) -> int:
+    # Input without any keyword's first letter can't match (e.g. digits only).
+    if _KEYWORD_FIRST_CHARS.isdisjoint(user_input):
+        return _OUT_OF_SCOPE_INDEX
+
+    # One pass over the input, keeping the highest-priority hit.  Group
+    # ``c<i>`` is capture group ``i + 1``.
+    best = _OUT_OF_SCOPE_INDEX
+    for match in _KEYWORD_RE.finditer(user_input):
+        priority = match.lastindex - 1
+        if priority < best:
+            best = priority
+            if best == 0:
+                break
+
+    return best
@@ -0,0 +1,27 @@
+"""Shared pytest fixtures."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.agent.graph import _get_react_agent, get_graph, run_agent
+
+
+@pytest.fixture
+def mock_react_agent(monkeypatch) -> AsyncMock:
+    """Replace the inner ReAct agent's ``ainvoke`` so no LLM is called.
+
+    Set ``return_value`` to the agent state the test wants to simulate.
+    """
+    mock = AsyncMock()
+    monkeypatch.setattr(_get_react_agent(), "ainvoke", mock)
+    return mock
+
+
+@pytest.fixture(scope="session")
+def agent():
+    """The graph's ``run_agent`` entry point, with the graph compiled once up front."""
+    get_graph()
+    return run_agent
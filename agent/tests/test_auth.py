@@ -0,0 +1,106 @@
+"""Tests for OpenEMR OAuth2 token management."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.auth.oauth2 import OpenEMRAuth
+
+
+class _CountingGrant:
+    """Stands in for ``_password_grant`` / ``_refresh`` and counts its calls.
+
+    Each call yields to the event loop briefly (so concurrent callers can
+    pile up behind it) and then stores *token* as the new access token.
+    """
+
+    def __init__(self, auth: OpenEMRAuth, token: str) -> None:
+        self.auth = auth
+        self.token = token
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        self.auth._store_tokens({"access_token": self.token, "expires_in": 3600})
+        return self.auth._access_token
+
+
+@pytest.fixture
+def auth() -> OpenEMRAuth:
+    return OpenEMRAuth(client_id="test-client")
+
+
+@pytest.fixture
+def fake_grant(auth):
+    """Return ``install(method, token)``, which swaps a grant for a counting fake."""
+
+    def install(method: str, token: str) -> _CountingGrant:
+        fake = _CountingGrant(auth, token)
+        setattr(auth, method, fake)
+        return fake
+
+    return install
+
+
+@pytest.mark.asyncio
+async def test_concurrent_ensure_token_fetches_once(auth, fake_grant):
+    """Concurrent callers with no valid token share one password grant."""
+    grant = fake_grant("_password_grant", "tok")
+
+    tokens = await asyncio.gather(*(auth.ensure_token() for _ in range(5)))
+
+    assert tokens == ["tok"] * 5
+    assert grant.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_token_is_served_while_refreshing_in_background(auth, fake_grant):
+    """A token inside the stale window is returned at once and renewed once."""
+    auth._store_tokens({"access_token": "old", "refresh_token": "r", "expires_in": 3600})
+    auth._stale_at = 0.0  # past the stale point, not yet expired
+    refresh = fake_grant("_refresh", "new")
+
+    tokens = await asyncio.gather(*(auth.ensure_token() for _ in range(5)))
+    assert tokens == ["old"] * 5
+
+    await auth._refresh_task
+    assert refresh.calls == 1
+    assert await auth.ensure_token() == "new"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_expired_refreshes_once(auth, fake_grant):
+    """Callers past expiry share one refresh instead of each firing one."""
+    auth._store_tokens({"access_token": "old", "refresh_token": "r", "expires_in": 0})
+    refresh = fake_grant("_refresh", "new")
+
+    tokens = await asyncio.gather(*(auth.ensure_token() for _ in range(5)))
+
+    assert tokens == ["new"] * 5
+    assert refresh.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_parallel_invalidate_reauthenticates_once(auth, fake_grant):
+    """Two calls rejecting the same token trigger a single password grant."""
+    auth._store_tokens({"access_token": "bad", "expires_in": 3600})
+    grant = fake_grant("_password_grant", "good")
+
+    tokens = await asyncio.gather(auth.invalidate("bad"), auth.invalidate("bad"))
+
+    assert tokens == ["good", "good"]
+    assert grant.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_short_lived_token_does_not_refresh_on_every_call(auth, fake_grant):
+    """A token shorter-lived than the stale jitter is still served as fresh."""
+    auth._store_tokens({"access_token": "short", "refresh_token": "r", "expires_in": 60})
+    refresh = fake_grant("_refresh", "new")
+
+    assert await auth.ensure_token() == "short"
+    assert auth._refresh_task is None
+    assert refresh.calls == 0
@@ -0,0 +1,32 @@
+"""Tests for the in-process TTL/LRU cache used by the tools."""
+
+from __future__ import annotations
+
+from src.tools.cache import MISSING, TTLCache
+
+
+def test_get_returns_set_value():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", None)
+    assert c.get("a") is None
+    assert c.get("b") is MISSING
+
+
+def test_least_recently_used_entry_is_evicted():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") is MISSING
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+
+
+def test_entries_expire():
+    now = 1000.0
+    c = TTLCache(maxsize=2, ttl=10, clock=lambda: now)
+    c.set("a", 1)
+    now = 1010.0
+    assert c.get("a") is MISSING
+    assert len(c) == 0
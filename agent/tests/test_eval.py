@@ -9,11 +9,13 @@ Usage:
 
 from __future__ import annotations
 
+import functools
 from pathlib import Path
-from unittest.mock import AsyncMock, patch
+from typing import Awaitable, Callable
 
 import pytest
 import yaml
+from langchain_core.messages import AIMessage, HumanMessage
 
 from src.verification.scope_guard import apply_scope_guard, classify_input
 
@@ -23,17 +25,30 @@ _EVAL_DIR = Path(__file__).resolve().parent.parent / "eval"
 _CASES_FILE = _EVAL_DIR / "test_cases.yaml"
 
 
+# The libyaml-backed loader is much faster; fall back if PyYAML was built
+# without it.
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@functools.cache
 def _load_cases() -> list[dict]:
     with open(_CASES_FILE) as f:
-        data = yaml.safe_load(f)
+        data = yaml.load(f, Loader=_YamlLoader)
     return data["test_cases"]
 
 
-_ALL_CASES = _load_cases()
-
 # Partition into blocked vs allowed for different test strategies.
-_BLOCKED_CASES = [c for c in _ALL_CASES if c["should_block"]]
-_ALLOWED_CASES = [c for c in _ALL_CASES if not c["should_block"]]
+@functools.cache
+def _partition(should_block: bool) -> list[dict]:
+    return [c for c in _load_cases() if bool(c["should_block"]) == should_block]
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize ``blocked_case`` / ``allowed_case`` from the YAML file."""
+    for argname, should_block in (("blocked_case", True), ("allowed_case", False)):
+        if argname in metafunc.fixturenames:
+            cases = _partition(should_block)
+            metafunc.parametrize(argname, cases, ids=[c["id"] for c in cases])
 
 
 # ── Sanity: YAML loaded correctly ────────────────────────────────────────────
@@ -41,15 +56,16 @@ _ALLOWED_CASES = [c for c in _ALL_CASES if not c["should_block"]]
 
 def test_yaml_loaded():
     """Verify the YAML file contains the expected number of test cases."""
-    assert len(_ALL_CASES) >= 5, (
-        f"Expected at least 5 test cases, found {len(_ALL_CASES)}"
+    cases = _load_cases()
+    assert len(cases) >= 5, (
+        f"Expected at least 5 test cases, found {len(cases)}"
     )
 
 
 def test_all_cases_have_required_fields():
     required = {"id", "category", "input", "expected_tools",
                 "expected_output_contains", "should_block"}
-    for case in _ALL_CASES:
+    for case in _load_cases():
         missing = required - set(case.keys())
         assert not missing, f"Case {case.get('id', '?')} missing fields: {missing}"
 
@@ -57,13 +73,9 @@ def test_all_cases_have_required_fields():
 # ── Blocked cases: scope guard rejects without hitting the LLM ───────────────
 
 
-@pytest.mark.parametrize(
-    "case",
-    _BLOCKED_CASES,
-    ids=[c["id"] for c in _BLOCKED_CASES],
-)
-def test_scope_guard_blocks(case: dict):
+def test_scope_guard_blocks(blocked_case: dict):
     """Verify the scope guard blocks adversarial/out-of-scope queries."""
+    case = blocked_case
     is_allowed, block_message = apply_scope_guard(case["input"])
 
     assert is_allowed is False, (
@@ -83,13 +95,9 @@ def test_scope_guard_blocks(case: dict):
 # ── Allowed cases: scope guard passes, then agent produces expected output ───
 
 
-@pytest.mark.parametrize(
-    "case",
-    _ALLOWED_CASES,
-    ids=[c["id"] for c in _ALLOWED_CASES],
-)
-def test_scope_guard_allows(case: dict):
+def test_scope_guard_allows(allowed_case: dict):
     """Verify the scope guard lets valid queries through."""
+    case = allowed_case
     is_allowed, block_message = apply_scope_guard(case["input"])
 
     assert is_allowed is True, (
@@ -99,39 +107,30 @@ def test_scope_guard_allows(case: dict):
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize(
-    "case",
-    _ALLOWED_CASES,
-    ids=[c["id"] for c in _ALLOWED_CASES],
-)
-async def test_agent_response(case: dict):
+async def test_agent_response(
+    allowed_case: dict,
+    agent: Callable[[str], Awaitable[dict]],
+    mock_react_agent,
+):
     """Run allowed queries through the agent and verify expected output.
 
     The inner ReAct agent is mocked so we don't hit live APIs or LLMs.
     The mock returns a canned response containing the keywords the test
     case expects, letting us verify end-to-end wiring.
     """
-    from langchain_core.messages import AIMessage, HumanMessage
-
-    from src.agent.graph import run_agent
-
+    case = allowed_case
     fake_response = " | ".join(case["expected_output_contains"])
+    mock_react_agent.return_value = {
+        "messages": [
+            HumanMessage(content=case["input"]),
+            AIMessage(content=fake_response),
+        ],
+    }
 
-    with patch(
-        "src.agent.graph._react_agent.ainvoke",
-        new_callable=AsyncMock,
-    ) as mock_agent:
-        mock_agent.return_value = {
-            "messages": [
-                HumanMessage(content=case["input"]),
-                AIMessage(content=fake_response),
-            ],
-        }
-
-        result = await run_agent(case["input"])
+    result = await agent(case["input"])
 
     for expected in case["expected_output_contains"]:
-        assert expected.lower() in result.lower(), (
+        assert expected.lower() in result["response"].lower(), (
             f"[{case['id']}] Expected {expected!r} in agent response, "
             f"got: {result!r}"
         )
@@ -147,9 +146,10 @@ def test_eval_summary(request):
     Run with ``pytest tests/test_eval.py -v`` to see per-case results,
     or inspect the summary at the end.
     """
-    total = len(_ALL_CASES)
-    blocked = len(_BLOCKED_CASES)
-    allowed = len(_ALLOWED_CASES)
+    all_cases = _load_cases()
+    total = len(all_cases)
+    blocked = len(_partition(True))
+    allowed = len(_partition(False))
     print(
         f"\n{'='*60}\n"
         f"  EVAL SUMMARY\n"
@@ -157,6 +157,6 @@ def test_eval_summary(request):
         f"  Should block     : {blocked}\n"
         f"  Should allow     : {allowed}\n"
         f"  Categories       : "
-        f"{', '.join(sorted({c['category'] for c in _ALL_CASES}))}\n"
+        f"{', '.join(sorted({c['category'] for c in all_cases}))}\n"
         f"{'='*60}"
     )
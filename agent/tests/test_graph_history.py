@@ -0,0 +1,82 @@
+"""Tests for trimming conversation history before each model call."""
+
+from __future__ import annotations
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.agent.graph import _DISCLAIMER_NAME, _MAX_HISTORY_TOKENS, _trim_history
+from src.verification.scope_guard import CLINICAL_DISCLAIMER
+
+
+def _turn(i: int, filler: str) -> list:
+    """One past turn: question, tool call, tool result, answer, disclaimer."""
+    call_id = f"call-{i}"
+    return [
+        HumanMessage(content=f"Question {i}: {filler}"),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "patient_lookup", "args": {"last_name": "Smith"}, "id": call_id},
+            ],
+        ),
+        ToolMessage(content=f"Result {i}: {filler}", tool_call_id=call_id),
+        AIMessage(content=f"Answer {i}: {filler}"),
+        AIMessage(content=CLINICAL_DISCLAIMER, name=_DISCLAIMER_NAME),
+    ]
+
+
+def _assert_no_orphan_tool_results(messages: list) -> None:
+    issued: set[str] = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            issued.update(call["id"] for call in message.tool_calls)
+        elif isinstance(message, ToolMessage):
+            assert message.tool_call_id in issued, message
+
+
+def test_long_history_is_trimmed_to_whole_recent_turns():
+    history = [m for i in range(40) for m in _turn(i, "lorem ipsum " * 20)]
+    current = HumanMessage(content="What are his allergies?")
+
+    trimmed = _trim_history([*history, current])
+
+    assert count_tokens_approximately(trimmed) <= _MAX_HISTORY_TOKENS
+    assert len(trimmed) < len(history)
+    assert isinstance(trimmed[0], HumanMessage)
+    assert trimmed[-1] is current
+    assert all(m.name != _DISCLAIMER_NAME for m in trimmed)
+    _assert_no_orphan_tool_results(trimmed)
+
+
+def test_mid_turn_history_keeps_tool_call_with_its_result():
+    history = [m for i in range(40) for m in _turn(i, "lorem ipsum " * 20)]
+    # The model is called again after a tool result in the current turn.
+    current = _turn(99, "short")[:3]
+
+    trimmed = _trim_history([*history, *current])
+
+    assert count_tokens_approximately(trimmed) <= _MAX_HISTORY_TOKENS
+    assert isinstance(trimmed[0], HumanMessage)
+    assert trimmed[-3:] == current
+    _assert_no_orphan_tool_results(trimmed)
+
+
+def test_current_turn_over_budget_is_sent_whole():
+    history = _turn(0, "short")
+    # A tool result far larger than the whole budget.
+    current = _turn(1, "lorem ipsum " * (_MAX_HISTORY_TOKENS * 2))[:3]
+    assert count_tokens_approximately(current) > _MAX_HISTORY_TOKENS
+
+    trimmed = _trim_history([*history, *current])
+
+    assert trimmed == current
+
+
+def test_short_history_is_unchanged_apart_from_disclaimers():
+    history = _turn(0, "short")
+    current = HumanMessage(content="And his allergies?")
+
+    trimmed = _trim_history([*history, current])
+
+    assert trimmed == [*history[:4], current]
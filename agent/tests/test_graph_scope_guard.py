@@ -6,11 +6,20 @@ allowed inputs reach the agent node) WITHOUT calling the real LLM.
 
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, patch
+import asyncio
+import json
+import re
+import uuid
 
 import pytest
-
-from src.agent.graph import graph, run_agent
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import tool
+
+import src.agent.graph as graph_module
+from src.agent.graph import run_agent, run_agent_stream
 from src.verification.scope_guard import (
     BLOCK_MESSAGES,
     CLINICAL_DISCLAIMER,
@@ -24,24 +33,20 @@ from src.verification.scope_guard import (
 
 
 @pytest.mark.asyncio
-async def test_diagnosis_blocked_no_llm_call():
-    """A diagnosis request should return the block message directly."""
-    resp = await run_agent("Diagnose what's wrong with me")
-    assert resp == BLOCK_MESSAGES[DIAGNOSIS_REQUEST]
-
-
-@pytest.mark.asyncio
-async def test_treatment_blocked_no_llm_call():
-    """A treatment/prescribe request should return the block message."""
-    resp = await run_agent("What medication should I prescribe?")
-    assert resp == BLOCK_MESSAGES[TREATMENT_REQUEST]
-
-
-@pytest.mark.asyncio
-async def test_out_of_scope_blocked():
-    """An unrelated query should return the out-of-scope message."""
-    resp = await run_agent("Write me a poem about cats")
-    assert resp == BLOCK_MESSAGES[OUT_OF_SCOPE]
+async def test_blocked_requests_no_llm_call():
+    """Diagnosis, treatment and out-of-scope requests return their block messages.
+
+    Blocked inputs never leave the scope-guard node, so the three run
+    concurrently on fresh threads in a single test.
+    """
+    diagnosis, treatment, out_of_scope = await asyncio.gather(
+        run_agent("Diagnose what's wrong with me"),
+        run_agent("What medication should I prescribe?"),
+        run_agent("Write me a poem about cats"),
+    )
+    assert diagnosis["response"] == BLOCK_MESSAGES[DIAGNOSIS_REQUEST]
+    assert treatment["response"] == BLOCK_MESSAGES[TREATMENT_REQUEST]
+    assert out_of_scope["response"] == BLOCK_MESSAGES[OUT_OF_SCOPE]
 
 
 # ── Allowed requests reach the agent ────────────────────────────────────────
@@ -50,49 +55,40 @@ async def test_out_of_scope_blocked():
 
 
 @pytest.mark.asyncio
-async def test_data_retrieval_reaches_agent():
+async def test_data_retrieval_reaches_agent(mock_react_agent):
     """A data-retrieval query should pass through the scope guard."""
-    with patch(
-        "src.agent.graph._react_agent.ainvoke",
-        new_callable=AsyncMock,
-    ) as mock_agent:
-        from langchain_core.messages import AIMessage, HumanMessage
-
-        mock_agent.return_value = {
-            "messages": [
-                HumanMessage(content="Look up patient John Smith"),
-                AIMessage(content="Found patient John Smith."),
-            ],
-        }
+    mock_react_agent.return_value = {
+        "messages": [
+            HumanMessage(content="Look up patient John Smith"),
+            AIMessage(content="Found patient John Smith."),
+        ],
+    }
 
-        resp = await run_agent("Look up patient John Smith")
-        # The agent was invoked (not short-circuited).
-        mock_agent.assert_called_once()
-        assert "John Smith" in resp
+    resp = await run_agent("Look up patient John Smith")
+    # The agent was invoked (not short-circuited).
+    mock_react_agent.assert_called_once()
+    assert "John Smith" in resp["response"]
 
 
 @pytest.mark.asyncio
-async def test_clinical_support_reaches_agent_with_disclaimer():
+async def test_clinical_support_reaches_agent_with_disclaimer(mock_react_agent):
     """A clinical-support query should pass through and get a disclaimer."""
-    with patch(
-        "src.agent.graph._react_agent.ainvoke",
-        new_callable=AsyncMock,
-    ) as mock_agent:
-        from langchain_core.messages import AIMessage, HumanMessage
-
-        mock_agent.return_value = {
-            "messages": [
-                HumanMessage(content="Check drug interaction between aspirin and warfarin"),
-                AIMessage(content="There is a known interaction."),
-            ],
-        }
-
-        resp = await run_agent(
-            "Check drug interaction between aspirin and warfarin"
-        )
-        mock_agent.assert_called_once()
-        assert "known interaction" in resp
-        assert "Disclaimer" in resp or "clinical support" in resp
+    mock_react_agent.return_value = {
+        "messages": [
+            HumanMessage(content="Check drug interaction between aspirin and warfarin"),
+            AIMessage(content="There is a known interaction."),
+        ],
+    }
+
+    resp = await run_agent(
+        "Check drug interaction between aspirin and warfarin"
+    )
+    mock_react_agent.assert_called_once()
+    assert "known interaction" in resp["response"]
+    assert (
+        "Disclaimer" in resp["response"]
+        or "clinical support" in resp["response"]
+    )
 
 
 # ── Multiple blocked requests don't leak state ──────────────────────────────
@@ -104,7 +100,101 @@ async def test_sequential_blocks_independent():
     tid = "test-thread-blocks"
 
     resp1 = await run_agent("Diagnose this rash", thread_id=tid)
-    assert resp1 == BLOCK_MESSAGES[DIAGNOSIS_REQUEST]
+    assert resp1["response"] == BLOCK_MESSAGES[DIAGNOSIS_REQUEST]
 
     resp2 = await run_agent("Prescribe antibiotics", thread_id=tid)
-    assert resp2 == BLOCK_MESSAGES[TREATMENT_REQUEST]
+    assert resp2["response"] == BLOCK_MESSAGES[TREATMENT_REQUEST]
+
+
+# ── Streaming ───────────────────────────────────────────────────────────────
+
+
+@pytest.mark.asyncio
+async def test_stream_blocked_yields_block_message():
+    """A blocked request streams the block message as a single token."""
+    events = [e async for e in run_agent_stream("Write me a poem about cats")]
+    assert events == [
+        {"type": "token", "content": BLOCK_MESSAGES[OUT_OF_SCOPE]},
+    ]
+
+
+class _StreamingFakeModel(GenericFakeChatModel):
+    """Fake chat model that streams word tokens and then its tool calls.
+
+    ``GenericFakeChatModel`` streams content only; the agent also needs the
+    tool calls streamed as chunks to run its tools.
+    """
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        message_id = f"lc_run-{uuid.uuid4().hex}"
+        chunks = [
+            AIMessageChunk(content=token, id=message_id)
+            for token in re.split(r"(\s)", message.content)
+            if token
+        ]
+        chunks += [
+            AIMessageChunk(
+                content="",
+                id=message_id,
+                tool_call_chunks=[{
+                    "name": call["name"],
+                    "args": json.dumps(call["args"]),
+                    "id": call["id"],
+                    "index": index,
+                }],
+            )
+            for index, call in enumerate(message.tool_calls)
+        ]
+        for chunk in chunks:
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+@tool
+async def _fake_patient_lookup(last_name: str) -> str:
+    """Look up a patient by last name."""
+    return "John Smith (UUID: u-1)"
+
+
+def _lookup_call(call_id: str) -> dict:
+    return {"name": _fake_patient_lookup.name, "args": {"last_name": "Smith"}, "id": call_id}
+
+
+@pytest.mark.asyncio
+async def test_stream_allowed_yields_tokens_tools_and_disclaimer(monkeypatch):
+    """An allowed turn streams each LLM call's text, each tool once, then the disclaimer."""
+    model = _StreamingFakeModel(messages=iter([
+        AIMessage(content="Let me check.", tool_calls=[_lookup_call("call-1")]),
+        AIMessage(content="", tool_calls=[_lookup_call("call-2")]),
+        AIMessage(content="Found John Smith."),
+    ]))
+    agent = create_agent(
+        model,
+        [_fake_patient_lookup],
+        system_prompt=graph_module._SYSTEM_MESSAGE,
+        middleware=[graph_module._TrimHistoryMiddleware()],
+    )
+    monkeypatch.setattr(graph_module, "_get_react_agent", lambda: agent)
+    graph = graph_module.get_graph.__wrapped__()
+    monkeypatch.setattr(graph_module, "get_graph", lambda: graph)
+
+    events = [
+        e async for e in run_agent_stream("Check drug interactions for patient Smith")
+    ]
+
+    tool_events = [e for e in events if e["type"] == "tool"]
+    assert tool_events == [{"type": "tool", "name": _fake_patient_lookup.name}]
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 3  # streamed piecewise, not as whole messages
+    assert "".join(tokens) == "Let me check.\n\nFound John Smith." + CLINICAL_DISCLAIMER
+    assert tokens[-1] == CLINICAL_DISCLAIMER
+    # The tool event arrives between the two LLM calls' text.
+    assert events.index(tool_events[0]) < next(
+        i for i, e in enumerate(events) if e.get("content", "").startswith("\n\nFound")
+    )
@@ -0,0 +1,50 @@
+"""Tests for the FastAPI app's health endpoint."""
+
+from __future__ import annotations
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import src.main as main
+
+
+@pytest.fixture
+def openemr_probe(monkeypatch):
+    """Answer health probes from a mock OpenEMR and record them."""
+    probes: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        probes.append(request)
+        return httpx.Response(200, json={"resourceType": "CapabilityStatement"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(main, "_health_client", client)
+    monkeypatch.setattr(main, "_health_checked_at", 0.0)
+    monkeypatch.setattr(main, "_health_connected", False)
+    return probes
+
+
+def test_health_reuses_probe_within_ttl(openemr_probe):
+    with TestClient(main.app) as client:
+        first = client.get("/health").json()
+        second = client.get("/health").json()
+
+    assert first == second == {"status": "healthy", "openemr_connected": True}
+    assert len(openemr_probe) == 1
+
+
+@pytest.mark.asyncio
+async def test_health_client_is_recreated_after_shutdown(monkeypatch):
+    monkeypatch.setattr(main, "_health_client", None)
+
+    first = main._get_health_client()
+    assert main._get_health_client() is first
+
+    # What the lifespan handler does when the app shuts down.
+    await first.aclose()
+    second = main._get_health_client()
+
+    assert second is not first
+    assert not second.is_closed
+    await second.aclose()
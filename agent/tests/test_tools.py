@@ -1 +1,413 @@
 """Tests for OpenEMR API tool wrappers."""
+
+from __future__ import annotations
+
+import importlib
+import re
+import threading
+
+import httpx
+import pytest
+
+from src.auth.oauth2 import OpenEMRAuth
+
+# ``src.tools`` re-exports each tool under its module's name, so fetch the
+# modules themselves explicitly.
+patient_lookup_module = importlib.import_module("src.tools.patient_lookup")
+allergy_module = importlib.import_module("src.tools.allergy_check")
+drug_module = importlib.import_module("src.tools.drug_interaction_check")
+
+
+class _FakeAuth:
+    """Stands in for ``OpenEMRAuth.instance()`` with a mock transport."""
+
+    # The real 401 retry, running against the fake's client and invalidate().
+    get = OpenEMRAuth.get
+
+    def __init__(self, handler) -> None:
+        self.client = httpx.AsyncClient(
+            base_url="https://openemr.test", transport=httpx.MockTransport(handler)
+        )
+
+
+@pytest.fixture
+def openemr(monkeypatch):
+    """Route tool requests to a canned OpenEMR and record them."""
+    requests: list[httpx.Request] = []
+    patients = [{"uuid": "u-1", "fname": "John", "lname": "Smith", "DOB": "1980-01-15"}]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"data": patients})
+
+    fake = _FakeAuth(handler)
+    monkeypatch.setattr(patient_lookup_module.OpenEMRAuth, "instance", lambda: fake)
+    patient_lookup_module.cache_clear()
+    yield requests
+    patient_lookup_module.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_patient_lookup_caches_repeat_queries(openemr):
+    args = {"last_name": "Smith", "first_name": "John"}
+    first = await patient_lookup_module.patient_lookup.ainvoke(args)
+    second = await patient_lookup_module.patient_lookup.ainvoke(args)
+
+    assert "John Smith (UUID: u-1)" in first
+    assert second == first
+    assert len(openemr) == 1
+
+
+@pytest.mark.asyncio
+async def test_patient_lookup_cache_is_keyed_on_search_fields(openemr):
+    await patient_lookup_module.patient_lookup.ainvoke({"last_name": "Smith"})
+    await patient_lookup_module.patient_lookup.ainvoke({"last_name": "Doe"})
+
+    assert len(openemr) == 2
+
+
+@pytest.mark.asyncio
+async def test_patient_lookup_asks_openemr_for_one_page(openemr):
+    await patient_lookup_module.patient_lookup.ainvoke({"last_name": "Smith"})
+
+    limit = int(openemr[0].url.params["_limit"])
+    assert limit == patient_lookup_module._MAX_RESULTS + 1
+
+
+@pytest.mark.asyncio
+async def test_patient_lookup_retries_401_on_same_client(monkeypatch):
+    calls: list[str] = []
+    invalidated: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"]
+        calls.append(token)
+        if token == "Bearer stale":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"data": []})
+
+    fake = _FakeAuth(handler)
+    fake.client.headers["Authorization"] = "Bearer stale"
+
+    async def invalidate(bad_token: str) -> str:
+        invalidated.append(bad_token)
+        fake.client.headers["Authorization"] = "Bearer fresh"
+        return "fresh"
+
+    fake.invalidate = invalidate
+    monkeypatch.setattr(patient_lookup_module.OpenEMRAuth, "instance", lambda: fake)
+    patient_lookup_module.cache_clear()
+
+    result = await patient_lookup_module.patient_lookup.ainvoke({"last_name": "Smith"})
+
+    assert result == "No patients found matching criteria."
+    assert invalidated == ["stale"]
+    assert calls == ["Bearer stale", "Bearer fresh"]
+    patient_lookup_module.cache_clear()
+
+
+
+# ── allergy_check ────────────────────────────────────────────────────────────
+
+_ABSENT_CODING = {
+    "system": "http://terminology.hl7.org/CodeSystem/data-absent-reason",
+    "code": "unknown",
+    "display": "Unknown",
+}
+
+
+def _allergy(substance_html: str, *reactions: dict, **fields) -> dict:
+    """An AllergyIntolerance as OpenEMR returns it: name only in text.div."""
+    return {
+        "resourceType": "AllergyIntolerance",
+        "code": {"coding": [_ABSENT_CODING]},
+        "text": {"status": "generated", "div": f"<div>{substance_html}</div>"},
+        "category": ["medication"],
+        "criticality": "high",
+        "reaction": list(reactions),
+        **fields,
+    }
+
+
+@pytest.fixture
+def fhir_allergies(monkeypatch):
+    """Serve a FHIR Bundle of the resources appended to the returned list."""
+    resources: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        entries = [{"resource": r} for r in resources]
+        return httpx.Response(200, json={"resourceType": "Bundle", "entry": entries})
+
+    fake = _FakeAuth(handler)
+    monkeypatch.setattr(allergy_module.OpenEMRAuth, "instance", lambda: fake)
+    return resources
+
+
+async def _allergies() -> str:
+    return await allergy_module.allergy_check.ainvoke({"patient_uuid": "u-1"})
+
+
+@pytest.mark.asyncio
+async def test_allergy_name_falls_back_to_narrative_and_decodes_entities(fhir_allergies):
+    fhir_allergies.append(_allergy("Trimethoprim &amp; sulfamethoxazole"))
+
+    result = await _allergies()
+
+    assert result == (
+        "Found 1 documented allergy(ies):\n\n"
+        "- Trimethoprim & sulfamethoxazole\n"
+        "  Category: medication  |  Criticality: high"
+    )
+
+
+@pytest.mark.asyncio
+async def test_allergy_prefers_real_coding_over_narrative(fhir_allergies):
+    coding = {"system": "http://snomed.info/sct", "display": "Penicillin"}
+    fhir_allergies.append(_allergy("ignored", code={"coding": [coding]}))
+
+    assert "- Penicillin\n" in await _allergies()
+
+
+@pytest.mark.asyncio
+async def test_allergy_reactions_are_reported_once(fhir_allergies):
+    fhir_allergies.append(
+        _allergy(
+            "Penicillin",
+            {
+                "manifestation": [{"coding": [{"display": "Hives"}]}, {"text": "Rash"}],
+                "description": "Hives",
+            },
+            {"manifestation": [{"text": "Rash"}, {"text": "Wheezing"}]},
+        )
+    )
+
+    result = await _allergies()
+
+    assert result.endswith("\n  Reactions: Hives, Rash, Wheezing")
+
+
+@pytest.mark.asyncio
+async def test_allergy_empty_bundle(fhir_allergies):
+    assert await _allergies() == "No allergies documented for this patient."
+
+
+@pytest.mark.asyncio
+async def test_allergy_large_bundle_parses_in_thread_with_same_output(fhir_allergies, monkeypatch):
+    fhir_allergies.extend(
+        _allergy(f"Substance {i}", {"manifestation": [{"text": "Rash"}]})
+        for i in range(allergy_module._THREAD_PARSE_THRESHOLD + 1)
+    )
+    format_allergies = allergy_module._format_allergies
+    threads: list[int] = []
+
+    def recording_format(allergies):
+        threads.append(threading.get_ident())
+        return format_allergies(allergies)
+
+    monkeypatch.setattr(allergy_module, "_format_allergies", recording_format)
+    in_thread = await _allergies()
+
+    monkeypatch.setattr(allergy_module, "_THREAD_PARSE_THRESHOLD", len(fhir_allergies))
+    inline = await _allergies()
+
+    loop_thread = threading.get_ident()
+    assert threads[0] != loop_thread
+    assert threads[1] == loop_thread
+    assert in_thread == inline
+    assert in_thread.startswith(f"Found {len(fhir_allergies)} documented allergy(ies)")
+
+# ── drug_interaction_check ───────────────────────────────────────────────────
+
+_GENERIC_NAME_RE = re.compile(r'generic_name:"([^"]+)"')
+
+
+class _FakeDrugApis:
+    """Canned RxNorm and openFDA responses, recording every request.
+
+    ``names`` maps an input to what approximateTerm suggests for it;
+    ``rxcuis`` maps an input to the name the rxcui + properties fallback
+    resolves.  ``labels`` maps a generic name to its openFDA label records.
+    """
+
+    def __init__(self) -> None:
+        self.names: dict[str, str] = {}
+        self.rxcuis: dict[str, str] = {}
+        self.labels: dict[str, list[dict]] = {}
+        self.requests: list[httpx.Request] = []
+
+    def paths(self) -> list[str]:
+        return [r.url.path for r in self.requests]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path, params = request.url.path, request.url.params
+
+        if path.endswith("/approximateTerm.json"):
+            name = self.names.get(params["term"])
+            candidates = [{"name": name, "rxcui": "1", "source": "RXNORM"}] if name else []
+            return httpx.Response(200, json={"approximateGroup": {"candidate": candidates}})
+
+        if path.endswith("/rxcui.json"):
+            name = self.rxcuis.get(params["name"])
+            return httpx.Response(200, json={"idGroup": {"rxnormId": [name]} if name else {}})
+
+        if path.endswith("/properties.json"):
+            rxcui = path.split("/")[-2]
+            return httpx.Response(200, json={"properties": {"name": rxcui}})
+
+        search = params["search"]
+        generic = _GENERIC_NAME_RE.search(search).group(1)
+        results = self.labels.get(generic, [])
+        if "_exists_:drug_interactions" in search:
+            results = [r for r in results if r.get("drug_interactions")]
+        if not results:
+            return httpx.Response(404, json={"error": {"code": "NOT_FOUND"}})
+        return httpx.Response(200, json={"results": results})
+
+
+@pytest.fixture
+def drug_apis(monkeypatch):
+    apis = _FakeDrugApis()
+    apis.names.update(aspirin="aspirin", warfarin="warfarin", ibuprofen="ibuprofen")
+    monkeypatch.setattr(
+        drug_module,
+        "_http_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(apis.handler)),
+    )
+    drug_module.cache_clear()
+    yield apis
+    drug_module.cache_clear()
+
+
+async def _check(*drug_names: str) -> str:
+    return await drug_module.drug_interaction_check.ainvoke({"drug_names": list(drug_names)})
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_found_in_first_drugs_label(drug_apis):
+    drug_apis.labels["aspirin"] = [
+        {"drug_interactions": ["Warfarin: aspirin increases the risk of bleeding."]},
+    ]
+
+    result = await _check("aspirin", "warfarin")
+
+    assert result.startswith("Found 1 interaction(s)")
+    assert "- aspirin + warfarin" in result
+    assert "increases the risk of bleeding" in result
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_falls_back_to_second_drugs_label(drug_apis):
+    drug_apis.labels["aspirin"] = [{"drug_interactions": ["Avoid alcohol."]}]
+    drug_apis.labels["warfarin"] = [
+        {"drug_interactions": ["Aspirin may potentiate the anticoagulant effect."]},
+    ]
+
+    result = await _check("aspirin", "warfarin")
+
+    assert "- aspirin + warfarin" in result
+    assert "potentiate the anticoagulant effect" in result
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_skips_labels_without_interactions_section(drug_apis):
+    # The top-ranked label is an OTC one with no interactions section.
+    drug_apis.labels["aspirin"] = [
+        {"warnings": ["Reye's syndrome."]},
+        {"drug_interactions": ["Do not combine with warfarin."]},
+    ]
+
+    result = await _check("aspirin", "warfarin")
+
+    assert "Do not combine with warfarin." in result
+    label_search = drug_apis.requests[-1].url.params["search"]
+    assert "_exists_:drug_interactions" in label_search
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_merges_sections_across_labels(drug_apis):
+    drug_apis.labels["aspirin"] = [
+        {"drug_interactions": ["Warfarin: bleeding risk."]},
+        {"drug_interactions": ["Ibuprofen: reduced antiplatelet effect."]},
+    ]
+
+    result = await _check("aspirin", "warfarin", "ibuprofen")
+
+    assert result.startswith("Found 2 interaction(s)")
+    assert "- aspirin + warfarin" in result
+    assert "- aspirin + ibuprofen" in result
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_none_found(drug_apis):
+    drug_apis.labels["aspirin"] = [{"warnings": ["Reye's syndrome."]}]
+
+    result = await _check("aspirin", "warfarin")
+
+    assert result == "No known interactions found between these medications."
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_fetches_each_label_once_concurrently(drug_apis):
+    await _check("aspirin", "warfarin", "ibuprofen")
+
+    label_requests = [p for p in drug_apis.paths() if p.endswith("/label.json")]
+    assert len(label_requests) == 3
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_repeat_check_is_served_from_cache(drug_apis):
+    drug_apis.labels["aspirin"] = [{"drug_interactions": ["Warfarin: bleeding risk."]}]
+
+    first = await _check("aspirin", "warfarin")
+    sent = len(drug_apis.requests)
+    second = await _check("warfarin", "aspirin")
+
+    assert second == first
+    assert len(drug_apis.requests) == sent
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_inputs_resolving_to_same_drug_are_checked_once(drug_apis):
+    drug_apis.names["Warfarin"] = "warfarin"
+    drug_apis.labels["aspirin"] = [{"drug_interactions": ["Warfarin: bleeding risk."]}]
+
+    result = await _check("warfarin", "Warfarin", "aspirin")
+    assert result.startswith("Found 1 interaction(s)")
+    assert "warfarin + warfarin" not in result
+
+    only_one_drug = await _check("warfarin", "Warfarin")
+    assert only_one_drug == "No known interactions found between these medications."
+
+
+@pytest.mark.asyncio
+async def test_drug_name_resolves_with_one_rxnorm_request(drug_apis):
+    await _check("aspirin", "warfarin")
+
+    approx = [r for r in drug_apis.requests if r.url.path.endswith("/approximateTerm.json")]
+    assert len(approx) == 2
+    assert all(r.url.params["option"] == "1" for r in approx)
+    assert not any(p.endswith(("/rxcui.json", "/properties.json")) for p in drug_apis.paths())
+
+
+@pytest.mark.asyncio
+async def test_drug_name_falls_back_to_rxcui_lookup_on_fuzzy_match(drug_apis):
+    # approximateTerm only offers a fuzzy guess, which must not be trusted.
+    drug_apis.names["asprin"] = "aspirin"
+    drug_apis.rxcuis["asprin"] = "aspirin"
+    drug_apis.labels["aspirin"] = [{"drug_interactions": ["Warfarin: bleeding risk."]}]
+
+    result = await _check("asprin", "warfarin")
+
+    rxnorm = [p.rsplit("/", 1)[-1] for p in drug_apis.paths() if "/REST/" in p]
+    assert rxnorm.count("approximateTerm.json") == 2
+    assert rxnorm.count("rxcui.json") == 1
+    assert rxnorm.count("properties.json") == 1
+    assert "- aspirin + warfarin" in result
+
+
+@pytest.mark.asyncio
+async def test_drug_interaction_reports_unresolved_names(drug_apis):
+    result = await _check("aspirin", "notadrug")
+
+    assert result == "Could not find drug: notadrug. Please verify spelling."